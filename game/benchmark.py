@@ -0,0 +1,197 @@
+# benchmark.py
+# Latency and throughput benchmark for the game loop.
+# Starts a local stand-in server for each player that answers the real /turn, /turns, /record, /records and /ready
+# contracts, then plays games against them through Game, Round and Turn at several concurrency levels.
+# Reports p50/p95/p99 latency per turn, round and game and games/sec at each level, and saves the results
+# as json so a later run can be compared against them with --baseline.
+#
+# python benchmark.py --games 200 --concurrency 1 4 16 --output bench.json
+# python benchmark.py --games 200 --concurrency 1 4 16 --baseline bench.json
+
+import argparse                     # for parsing command line arguments
+import asyncio                      # for running the games
+import json                         # for the stand-in responses and the results file
+import logging                      # for quietening the game logs
+import random                       # for the stand-in throws and calls
+import statistics                   # for the latency percentiles
+import sys                          # for the exit code on regression
+import threading                    # for serving the stand-in players alongside the games
+import time                         # for the stand-in service delay and throughput
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StandInPlayer(BaseHTTPRequestHandler):
+    """Answers player requests like the python_player service, with an optional fixed service delay"""
+    protocol_version = "HTTP/1.1"   # keep-alive, as the real players
+    disable_nagle_algorithm = True  # headers and body are written separately, don't let them wait on delayed acks
+    delay = 0.0
+
+    def do_GET(self) -> None:
+        if self.path == "/ready":
+            self._reply(b"true")
+        else:
+            self._reply(b'{"detail":"Not Found"}', status=404)
+        return None
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.delay:
+            time.sleep(self.delay)
+        if self.path == "/turn":
+            self._reply(json.dumps(self._turn(body)).encode())
+        elif self.path == "/turns":
+            self._reply(json.dumps({"turns": [self._turn(t) for t in body["turns"]]}).encode())
+        elif self.path == "/records":
+            self._reply(json.dumps({"received": len(body["records"])}).encode())
+        elif self.path == "/record":
+            self._reply(b"{}")
+        else:
+            self._reply(b'{"detail":"Not Found"}', status=404)
+        return None
+
+    def _turn(self, body) -> dict:
+        throw = random.randint(1, 5)
+        return {"resgameid": body["reqgameid"],
+                "resroundno": body["reqroundno"],
+                "resthrow": throw,
+                "rescall": throw + (body["reqplayercount"] - 1) * random.randint(1, 5)}
+
+    def _reply(self, payload, status=200) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        return None
+
+    def log_message(self, format, *args) -> None:
+        return None
+
+
+class LatencyCollector:
+    """Game observer that keeps the latency of every turn, round and game"""
+    def __init__(self) -> None:
+        self.turns = []
+        self.rounds = []
+        self.games = []
+        return None
+
+    def on_round(self, round) -> None:
+        self.rounds.append(round.latency)
+        for t in round.turns:
+            self.turns.append(t.latency)
+        return None
+
+    def on_game(self, game) -> None:
+        self.games.append(game.latency)
+        return None
+
+
+def start_stand_ins(player_names, delay) -> dict:
+    """Starts a stand-in server per player on a free local port, returns the player urls"""
+    StandInPlayer.delay = delay
+    urls = {}
+    for name in player_names:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StandInPlayer)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        urls[name] = "http://127.0.0.1:" + str(server.server_address[1])
+    return urls
+
+
+def percentiles(samples) -> dict:
+    if len(samples) < 2:
+        value = samples[0] * 1000 if samples else 0.0
+        return {"p50_ms": value, "p95_ms": value, "p99_ms": value, "count": len(samples)}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50_ms": cuts[49] * 1000, "p95_ms": cuts[94] * 1000, "p99_ms": cuts[98] * 1000, "count": len(samples)}
+
+
+async def run_level(game, urls, num_games, concurrency, batch_turns=False) -> dict:
+    """Plays num_games games with concurrency games at a time, returns the latency percentiles and throughput"""
+    clients = {name: game.PlayerClient(url, pool_size=max(10, concurrency), batch_turns=batch_turns) for name, url in urls.items()}
+    delivery = game.RecordDelivery(clients)
+    delivery.start()
+    collector = LatencyCollector()
+    games = iter(range(0, num_games))
+
+    async def worker() -> None:
+        for _ in games:
+            await game.Game(clients, delivery, observers=(collector,)).play()
+        return None
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(0, concurrency)))
+    elapsed = time.perf_counter() - start
+    await delivery.close()
+    for client in clients.values():
+        await client.aclose()
+    return {"concurrency": concurrency,
+            "games": num_games,
+            "games_per_sec": num_games / elapsed if elapsed else 0.0,
+            "turn": percentiles(collector.turns),
+            "round": percentiles(collector.rounds),
+            "game": percentiles(collector.games)}
+
+
+def compare(results, baseline, tolerance) -> list:
+    """Returns a description of every latency or throughput figure more than tolerance worse than the baseline"""
+    regressions = []
+    previous = {level["concurrency"]: level for level in baseline["levels"]}
+    for level in results["levels"]:
+        before = previous.get(level["concurrency"])
+        if before is None:
+            continue
+        if level["games_per_sec"] < before["games_per_sec"] * (1 - tolerance):
+            regressions.append(f"c={level['concurrency']} games/sec {before['games_per_sec']:.1f} -> {level['games_per_sec']:.1f}")
+        for scope in ("turn", "round", "game"):
+            for p in ("p50_ms", "p95_ms", "p99_ms"):
+                if level[scope][p] > before[scope][p] * (1 + tolerance):
+                    regressions.append(f"c={level['concurrency']} {scope} {p} {before[scope][p]:.2f} -> {level[scope][p]:.2f}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the game loop against local stand-in players.")
+    parser.add_argument('-g', '--games', type=int, default=100, help='Games played at each concurrency level, default is 100.')
+    parser.add_argument('-c', '--concurrency', type=int, nargs='+', default=[1, 4, 16], help='Concurrency levels to run, default is 1 4 16.')
+    parser.add_argument('--batch_turns', action='store_true', help='Batch the turn requests of concurrent games on /turns.')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds each stand-in player takes to answer, default is 0.')
+    parser.add_argument('-o', '--output', default="benchmark_results.json", help='File the results are written to, default is benchmark_results.json.')
+    parser.add_argument('--baseline', default=None, help='Results file from an earlier run to check for regressions against.')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Fraction a figure may be worse than the baseline before it is a regression, default is 0.1.')
+    bench_args = parser.parse_args()
+
+    import main as game             # tracing is never set up, the benchmark measures the game loop alone
+    logging.basicConfig(level=logging.WARNING)
+
+    urls = start_stand_ins(list(game.PLAYER_SERVICES), bench_args.delay)
+    results = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "python": sys.version.split()[0],
+               "delay": bench_args.delay,
+               "batch_turns": bench_args.batch_turns,
+               "levels": []}
+    for concurrency in bench_args.concurrency:
+        level = asyncio.run(run_level(game, urls, bench_args.games, concurrency, bench_args.batch_turns))
+        results["levels"].append(level)
+        print(f"concurrency {concurrency:>4}: {level['games_per_sec']:8.1f} games/sec"
+              f"  turn p50/p95/p99 {level['turn']['p50_ms']:.2f}/{level['turn']['p95_ms']:.2f}/{level['turn']['p99_ms']:.2f} ms"
+              f"  round p50/p95/p99 {level['round']['p50_ms']:.2f}/{level['round']['p95_ms']:.2f}/{level['round']['p99_ms']:.2f} ms"
+              f"  game p50/p95/p99 {level['game']['p50_ms']:.1f}/{level['game']['p95_ms']:.1f}/{level['game']['p99_ms']:.1f} ms")
+
+    with open(bench_args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print("Results written to " + bench_args.output)
+
+    if bench_args.baseline:
+        with open(bench_args.baseline) as f:
+            regressions = compare(results, json.load(f), bench_args.tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+    return None
+
+
+if __name__ == "__main__":
+    main()
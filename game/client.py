@@ -0,0 +1,471 @@
+# client.py
+
+import asyncio                      # for backing off between retries
+import hashlib                      # for sharding games across player replicas
+import logging                      # for logging
+import math                         # for weighting the replicas shares of the games
+import random                       # for the local players throws and calls
+import time                         # for timing requests against the latency budget and quarantines
+import httpx                        # for pooled, keep-alive connections to the player apis
+import seeding                      # for the local players seeded throws and calls
+
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying, the request never reached the player or the pooled connection was closed under us.
+# A PoolTimeout is ours, no pooled connection came free in time so the request was never sent. Timeouts waiting
+# on the player are not retried, a player that is too slow has already used up its turn. Retries never stretch
+# a turn past --turn_timeout, Turn.take bounds the whole request.
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.RemoteProtocolError, httpx.PoolTimeout)
+
+
+def _decode(response) -> dict:
+    """The json body of a successful response, empty if there is none, go_player answers /record with an empty 201"""
+    try:
+        return response.json()
+    except ValueError:
+        return {}
+
+
+class PlayerUnavailable(Exception):
+    """Raised instead of sending a request to a player that is quarantined"""
+
+
+class RecordsPartiallyDelivered(Exception):
+    """Raised when some replicas took their share of a batch of records and others failed with error"""
+    def __init__(self, received, undelivered, error) -> None:
+        super().__init__(str(received) + " records delivered, " + str(len(undelivered)) + " not: " + repr(error))
+        self.received = received
+        self.undelivered = undelivered
+        self.error = error
+
+
+class CircuitBreaker:
+    """
+    Tracks the health of a player service.
+    A request that fails to reach the player, gets a 5xx response or takes longer than latency_budget
+    seconds is a failure. After failure_threshold failures in a row the breaker trips and the player is
+    quarantined for cooldown seconds, doubling on every trip in a row up to max_cooldown.
+    Once the quarantine is over the player is half open: exactly one trial request is let through
+    and decides whether it is healthy again (the breaker closes) or not (the breaker trips again).
+    Other requests are refused until the trial is decided.
+    """
+    def __init__(self, failure_threshold=5, latency_budget=1.0, cooldown=5.0, max_cooldown=60.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.latency_budget = latency_budget
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self.trial = False  # whether the half open trial request is in flight
+        return None
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() < self.open_until:
+                return False
+            self.state = "half_open"
+            self.trial = False
+        if self.state == "half_open":
+            if self.trial:
+                return False
+            self.trial = True
+        return True
+
+    def end_trial(self) -> None:
+        """Lets another trial through if the one in flight ended without deciding, e.g. it was cancelled"""
+        if self.state == "half_open":
+            self.trial = False
+        return None
+
+    def quarantined(self) -> bool:
+        return self.state == "open" and time.monotonic() < self.open_until
+
+    def due_for_retry(self) -> bool:
+        return self.state == "open" and time.monotonic() >= self.open_until
+
+    def record_success(self, latency) -> None:
+        if latency > self.latency_budget:
+            self.record_failure()
+            return None
+        self.failures = 0
+        if self.state == "half_open":
+            self.state = "closed"
+            self.trips = 0
+            self.trial = False
+        return None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.trip()
+        return None
+
+    def trip(self) -> None:
+        self.trips += 1
+        self.state = "open"
+        self.trial = False
+        self.failures = 0
+        self.open_until = time.monotonic() + min(self.cooldown * (2 ** (self.trips - 1)), self.max_cooldown)
+        return None
+
+    def half_open(self) -> None:
+        self.state = "half_open"
+        self.trial = False
+        return None
+
+
+class TurnBatcher:
+    """
+    Coalesces the turn requests made to one player by concurrent games into batches on /turns.
+    The first turn request waits up to window seconds for others to join it, a batch is sent
+    as soon as it holds max_batch requests. Each caller gets back its own turn response,
+    callers left without one when the player answers fewer turns than it was sent get a ValueError.
+    """
+    def __init__(self, client, window=0.002, max_batch=64) -> None:
+        self.client = client
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._timer = None
+        self._tasks = set()  # the loop only keeps weak references to tasks, these are held until they finish
+        return None
+
+    async def turn(self, body) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((body, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return None
+
+    async def _send(self, batch) -> None:
+        try:
+            response = await self.client.post("/turns", {"turns": [body for body, _ in batch]})
+            turns = response["turns"]
+            for (_, future), turn in zip(batch, turns):
+                if not future.done():
+                    future.set_result(turn)
+            if len(turns) != len(batch):
+                raise ValueError("Expected " + str(len(batch)) + " turns from " + self.client.base_url + "/turns, got " + str(len(turns)))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        return None
+
+
+class PlayerClient:
+    """
+    Defines the connection to a player service.
+    One client is created per player service and shared by every game that player takes part in.
+    It keeps a pool of keep-alive connections open to the service so turns and records reuse
+    connections instead of setting up a new one per request, and retries failed requests
+    with exponential backoff.
+    An optional limiter, an asyncio.Semaphore shared between clients, caps the number of
+    requests in flight across every player service at once.
+    A CircuitBreaker tracks the health of the service, requests to a quarantined player raise
+    PlayerUnavailable without being sent.
+    With batch_turns, turn requests from concurrent games are sent together on the players /turns
+    endpoint by a TurnBatcher. Players that do not serve /turns get them one at a time on /turn.
+    """
+    def __init__(self, base_url, pool_size=10, retries=2, backoff=0.1, timeout=5.0, limiter=None,
+                 breaker=None, ready_timeout=1.0, batch_turns=False, batch_window=0.002, max_batch=64) -> None:
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = limiter
+        self.breaker = CircuitBreaker() if breaker is None else breaker
+        self.ready_timeout = ready_timeout
+        self.batcher = TurnBatcher(self, batch_window, max_batch) if batch_turns else None
+        self._client = httpx.AsyncClient(base_url=base_url,
+                                         timeout=timeout,
+                                         limits=httpx.Limits(max_connections=pool_size,
+                                                             max_keepalive_connections=pool_size))
+        return None
+
+    def get_url(self) -> str:
+        return self.base_url
+
+    async def turn(self, body) -> dict:
+        """Requests a turn from the player, in a batch if batching is on"""
+        if self.batcher is not None:
+            try:
+                return await self.batcher.turn(body)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code not in (404, 405):
+                    raise
+                if self.batcher is not None:
+                    logger.info(self.base_url + " does not serve /turns, falling back to /turn")
+                    self.batcher = None
+        # post to /turn directly, all players serve it without the trailing slash and httpx does not follow redirects
+        return await self.post("/turn", body)
+
+    async def post(self, path, body) -> dict:
+        """Posts the body to the player and returns the decoded json response, empty if it answered without one
+
+        Connection failures and 5xx responses are retried up to retries times, waiting
+        backoff, 2 * backoff, 4 * backoff ... seconds between attempts.
+
+        Args:
+            path (str): the endpoint on the player, e.g. /turn
+            body (dict): the json body to post
+
+        Returns:
+            dict: the json response from the player
+        """
+        if not self.breaker.allow():
+            raise PlayerUnavailable(self.base_url + " is quarantined")
+        trial = self.breaker.state == "half_open"  # allowed while half open, so this request is the trial
+        try:
+            response, service_time = await self._post(path, body)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code >= 500:
+                self._failed()
+            raise
+        except httpx.HTTPError:
+            self._failed()
+            raise
+        finally:
+            if trial:
+                self.breaker.end_trial()  # a no-op once the trial has closed or tripped the breaker
+        self.breaker.record_success(service_time)
+        if self.breaker.state == "open":
+            logger.warning(self.base_url + " is over its latency budget, quarantined")
+        return response
+
+    async def _post(self, path, body) -> tuple:
+        """Returns the json response and the service time of the attempt that got it
+
+        The service time is timed inside the limiter and leaves out the backoff between attempts,
+        so queueing on our side is never held against the player's latency budget.
+        """
+        attempt = 0
+        while True:
+            try:
+                if self.limiter is None:
+                    response, service_time = await self._attempt(path, body)
+                else:
+                    async with self.limiter:
+                        response, service_time = await self._attempt(path, body)
+                response.raise_for_status()
+                return _decode(response), service_time
+            except (RETRYABLE_ERRORS + (httpx.HTTPStatusError,)) as e:
+                server_error = isinstance(e, httpx.HTTPStatusError) and e.response.status_code >= 500
+                if attempt >= self.retries or not (server_error or isinstance(e, RETRYABLE_ERRORS)):
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                attempt += 1
+                logger.warning("Retrying " + path + " on " + self.base_url + " in " + str(delay) + "s after: " + repr(e))
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, path, body) -> tuple:
+        """Sends the request once, returns the response and how long the player took to give it"""
+        start = time.perf_counter()
+        try:
+            response = await self._client.post(path, json=body)
+        except asyncio.CancelledError:
+            self._failed()  # the turn deadline passed while the player had the request, as good as a timeout
+            raise
+        return response, time.perf_counter() - start
+
+    def _failed(self) -> None:
+        self.breaker.record_failure()
+        if self.breaker.state == "open":
+            logger.warning(self.base_url + " tripped its circuit breaker, quarantined")
+        return None
+
+    async def ready(self) -> bool:
+        """Returns true if the players /ready endpoint answers true within ready_timeout seconds, or the player has no /ready endpoint"""
+        try:
+            response = await self._client.get("/ready", timeout=self.ready_timeout)
+            if response.status_code in (404, 405):
+                return True  # go_player and node_player only serve /turn, /record and /metrics, answering at all is as ready as they get
+            return response.status_code == 200 and response.json() is True
+        except (httpx.HTTPError, ValueError):
+            return False
+
+    async def probe(self) -> bool:
+        """Returns true if the player can take part in a game
+
+        A healthy player is not probed. A quarantined player is probed on /ready once its quarantine
+        is over: if it is ready it is let back in half open, if not it is quarantined again.
+        """
+        if self.breaker.quarantined():
+            return False
+        if not self.breaker.due_for_retry():
+            return True
+        if await self.ready():
+            logger.info(self.base_url + " is ready again, leaving quarantine")
+            self.breaker.half_open()
+            return True
+        self.breaker.trip()
+        return False
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+        return None
+
+    def quarantine(self) -> None:
+        self.breaker.trip()
+        return None
+
+    def quarantined(self) -> bool:
+        return self.breaker.quarantined()
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets requests through again"""
+        return max(0.0, self.breaker.open_until - time.monotonic()) if self.breaker.state == "open" else 0.0
+
+
+class ShardedPlayerClient:
+    """
+    Balances one player across several replicas of its service, client side.
+    replicas is a list of (PlayerClient, weight), each replica with its own connection pool and breaker.
+    Games are sharded by game id with weighted rendezvous hashing: every turn and round record of a game
+    goes to the same replica, so a replica sees whole games, and each replica gets a share of the games
+    in proportion to its weight. Adding or removing a replica only moves the games that hashed to it.
+    A game whose replica is quarantined moves to its next replica until the quarantine is over.
+    """
+    def __init__(self, replicas) -> None:
+        self.replicas = [client for client, _ in replicas]
+        self.weights = [weight for _, weight in replicas]
+        self.base_url = ",".join(client.get_url() for client in self.replicas)
+        return None
+
+    def get_url(self) -> str:
+        return self.base_url
+
+    def _score(self, key, i) -> float:
+        digest = hashlib.blake2b((key + "|" + self.replicas[i].get_url()).encode(), digest_size=8).digest()
+        u = (int.from_bytes(digest, "big") + 0.5) / 2 ** 64  # uniform in (0, 1)
+        return self.weights[i] / -math.log(u)
+
+    def shard(self, key):
+        """The replica for key: the highest scoring replica that is not quarantined, or the highest scoring one if they all are"""
+        ranked = sorted(range(0, len(self.replicas)), key=lambda i: self._score(key, i), reverse=True)
+        for i in ranked:
+            if not self.replicas[i].breaker.quarantined():
+                return self.replicas[i]
+        return self.replicas[ranked[0]]
+
+    async def turn(self, body) -> dict:
+        return await self.shard(body["reqgameid"]).turn(body)
+
+    async def post(self, path, body) -> dict:
+        """
+        Posts to the replica of the game the body is for, a batch of records is split between the replicas of their games.
+        Each replica's share is posted on its own. If every share fails the first error is raised, if only some do
+        RecordsPartiallyDelivered is raised with the records that were not delivered, so only those are sent again.
+        """
+        if path == "/records":
+            shards = {}
+            for record in body["records"]:
+                shards.setdefault(self.shard(record["game_id"]), []).append(record)
+            responses = await asyncio.gather(*(replica.post(path, {"records": records}) for replica, records in shards.items()),
+                                             return_exceptions=True)
+            failed = [(records, response) for records, response in zip(shards.values(), responses) if isinstance(response, BaseException)]
+            if not failed:
+                return {"received": len(body["records"])}  # any 2xx is a delivery, whatever the replica answered
+            if len(failed) == len(shards):
+                raise failed[0][1]
+            undelivered = [record for records, _ in failed for record in records]
+            raise RecordsPartiallyDelivered(len(body["records"]) - len(undelivered), undelivered, failed[0][1])
+        if path == "/record":
+            return await self.shard(body["game_id"]).post(path, body)
+        if path == "/turn":
+            return await self.shard(body["reqgameid"]).post(path, body)
+        return await self.shard("").post(path, body)
+
+    async def ready(self) -> bool:
+        """Returns true if any replica is ready, replicas that are not are quarantined so no games are sharded to them"""
+        ready = await asyncio.gather(*(replica.ready() for replica in self.replicas))
+        for replica, is_ready in zip(self.replicas, ready):
+            if not is_ready:
+                logger.warning(replica.get_url() + " is not ready, quarantined")
+                replica.quarantine()
+        return any(ready)
+
+    async def probe(self) -> bool:
+        """Returns true if any replica can take part in a game, see PlayerClient.probe"""
+        return any(await asyncio.gather(*(replica.probe() for replica in self.replicas)))
+
+    async def aclose(self) -> None:
+        for replica in self.replicas:
+            await replica.aclose()
+        return None
+
+    def quarantine(self) -> None:
+        for replica in self.replicas:
+            replica.quarantine()
+        return None
+
+    def quarantined(self) -> bool:
+        """Returns true if every replica is quarantined, otherwise games move to the replicas that are not"""
+        return all(replica.quarantined() for replica in self.replicas)
+
+    def retry_after(self) -> float:
+        """Seconds until the first replica lets requests through again"""
+        return min(replica.retry_after() for replica in self.replicas)
+
+
+class LocalPlayerClient:
+    """
+    Stands in for a player service by calling its strategy in-process.
+    It answers the same requests as PlayerClient without any HTTP, so games can be played
+    locally and compared against the networked players to see what the transport costs.
+    With a seed, each turn is played from a generator derived from the seed, game id, round and player.
+    """
+    def __init__(self, player_name, strategy, rng=None, seed=None) -> None:
+        self.base_url = "local://" + player_name
+        self.player_name = player_name
+        self.strategy = strategy
+        self.seed = seed
+        self.rng = random.Random() if rng is None else rng
+        return None
+
+    def get_url(self) -> str:
+        return self.base_url
+
+    async def turn(self, body) -> dict:
+        return await self.post("/turn", body)
+
+    async def post(self, path, body) -> dict:
+        if path == "/turn":
+            rng = self.rng if self.seed is None else seeding.turn_rng(self.seed, body["reqgameid"], body["reqroundno"], self.player_name)
+            throw, call = self.strategy(body["reqplayercount"], rng)
+            return {"resgameid": body["reqgameid"],
+                    "resroundno": body["reqroundno"],
+                    "resthrow": throw,
+                    "rescall": call}
+        if path == "/records":
+            return {"received": len(body["records"])}
+        return {}
+
+    async def ready(self) -> bool:
+        return True
+
+    async def probe(self) -> bool:
+        return True
+
+    def quarantined(self) -> bool:
+        return False
+
+    async def aclose(self) -> None:
+        return None
@@ -0,0 +1,109 @@
+# dashboard.py
+# The interactive view of a tournament: a rich.live dashboard redrawn on its own tick instead of printing every round.
+# Observing a round only stores its outcome, the tables are built from the latest state a few times a second
+# and handed to rich, whose own thread writes them to the terminal. Any state between two ticks is never drawn,
+# so the cost of interactive mode does not grow with the game rate.
+
+import asyncio                      # for the refresh tick
+import collections                  # for the most recently played games
+import logging                      # for keeping log lines off the dashboard
+import sys                          # for the streams rich redirects while live
+import time                         # for the tournament rate
+from rich.console import Group
+from rich.live import Live
+from rich.table import Table
+
+
+class Dashboard:
+    """
+    Game observer that shows the tournament live: progress, per player standings from stats
+    (a TournamentStats), round timings from timings (a RoundTimings) and the latest round of
+    the max_games most recently played games.
+    While it is shown, log records below WARNING are left out and the rest are printed above it.
+    """
+    def __init__(self, stats, timings=None, num_games=0, refresh_per_second=4, max_games=10) -> None:
+        self.stats = stats
+        self.timings = timings
+        self.num_games = num_games
+        self.refresh_per_second = refresh_per_second
+        self.max_games = max_games
+        self.games = collections.OrderedDict()  # game id -> (round_no, total, [(player, throw, call, score)])
+        self.last_winner = None
+        self._start = time.perf_counter()
+        self._live = None
+        self._task = None
+        self._handlers = []
+        return None
+
+    def on_round(self, round) -> None:
+        self.games[round.game_id] = (round.round_no,
+                                     round.throw_total,
+                                     [(t.get_player().get_name(), t.throw, t.call, t.get_player().get_score()) for t in round.turns])
+        self.games.move_to_end(round.game_id)
+        if len(self.games) > self.max_games:
+            self.games.popitem(last=False)
+        return None
+
+    def on_game(self, game) -> None:
+        self.games.pop(game.game_id, None)
+        if game.get_winner() is not None:
+            self.last_winner = (str(game.game_id), game.get_winner(), game.round_no)
+        return None
+
+    def start(self) -> None:
+        self._start = time.perf_counter()
+        self._live = Live(self._render(), refresh_per_second=self.refresh_per_second)
+        self._live.start()
+        for handler in logging.getLogger().handlers:  # log through rich so lines land above the dashboard
+            if isinstance(handler, logging.StreamHandler):
+                self._handlers.append((handler, handler.stream, handler.level))
+                handler.setStream(sys.stderr)
+                handler.setLevel(max(handler.level, logging.WARNING))
+        self._task = asyncio.create_task(self._tick())
+        return None
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        self._live.update(self._render(), refresh=True)
+        self._live.stop()
+        for handler, stream, level in self._handlers:
+            handler.setStream(stream)
+            handler.setLevel(level)
+        return None
+
+    async def _tick(self) -> None:
+        while True:
+            await asyncio.sleep(1 / self.refresh_per_second)
+            self._live.update(self._render())  # drawn by rich on its next refresh
+
+    def _render(self) -> Group:
+        snapshot = self.stats.snapshot()
+        elapsed = time.perf_counter() - self._start
+        progress = f"Games {snapshot['games']}" + (f"/{self.num_games}" if self.num_games else "")
+        progress += f"  Rounds {snapshot['rounds']}  Rounds/game {snapshot['mean_rounds']:.1f}"
+        progress += f"  Games/sec {snapshot['games'] / elapsed if elapsed else 0:.1f}"
+        if self.timings is not None and self.timings.rounds.count:
+            progress += f"  Round p50/p99 {self.timings.rounds.quantile(0.5) * 1000:.2f}/{self.timings.rounds.quantile(0.99) * 1000:.2f} ms"
+        if self.last_winner is not None:
+            progress += f"\nLast game {self.last_winner[0][:8]} won by [green]{self.last_winner[1]}[/green] in {self.last_winner[2]} rounds"
+
+        standings = Table(title="Standings")
+        for column in ("Player", "Games", "Wins", "Win %", "Call %", "Forfeits"):
+            standings.add_column(column, justify="left" if column == "Player" else "right")
+        for name, p in sorted(snapshot["players"].items(), key=lambda item: -item[1]["wins"]):
+            standings.add_row(name, str(p["games"]), str(p["wins"]), f"{100 * p['win_rate']:.1f}",
+                              f"{100 * p['call_accuracy']:.1f}", str(p["forfeits"]))
+
+        names = list(snapshot["players"])
+        games = Table(title="Latest rounds, throw/call (score)")
+        games.add_column("Game")
+        games.add_column("Round", justify="right")
+        games.add_column("Total", justify="right")
+        for name in names:
+            games.add_column(name, justify="right")
+        for game_id, (round_no, total, turns) in reversed(list(self.games.items())):
+            cells = {name: (f"[green]{throw}/{call} ({score})[/green]" if call == total else f"{throw}/{call} ({score})")
+                     for name, throw, call, score in turns}
+            games.add_row(str(game_id)[:8], str(round_no), str(total), *(cells.get(name, "") for name in names))
+        return Group(progress, standings, games)
@@ -0,0 +1,153 @@
+# delivery.py
+
+import asyncio                      # for the background delivery tasks and queues
+import json                         # for writing dead letters
+import logging                      # for logging
+import httpx                        # for handling errors from the player apis
+from client import PlayerUnavailable, RecordsPartiallyDelivered
+
+
+logger = logging.getLogger(__name__)
+
+
+class RecordDelivery:
+    """
+    Delivers round records to the players in the background, off the game loop.
+    Each player has a bounded queue and a delivery task. The task batches up to batch_size
+    records, or whatever has arrived within flush_interval seconds of the first, and posts
+    them in one request to the players bulk /records endpoint. With no flush_interval a record
+    is sent as soon as it is queued, at the end of its round, batched only with the records
+    that queued up while the last batch was being sent, so a player sees a game's rounds while
+    it is still playing it. Players that do not serve
+    /records are sent the records one at a time on /record instead.
+    A batch that still fails after retries, or a record that arrives when the queue is full,
+    is dead-lettered: logged, counted and appended to dead_letter_path if one is given.
+    A quarantined player's records wait out its quarantine before each retry, until close is called,
+    after which they are dead-lettered. When a player is
+    sharded across replicas, only the records of the replicas that failed are retried.
+    close drains every queue before returning.
+    """
+    def __init__(self, clients, batch_size=50, flush_interval=0.0, max_queue=10000,
+                 retries=3, backoff=0.5, dead_letter_path=None) -> None:
+        self.clients = clients
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.backoff = backoff
+        self.dead_letter_path = dead_letter_path
+        self.delivered = 0
+        self.dead_lettered = 0
+        self._bulk = {name: True for name in clients}  # whether the player serves /records
+        self._queues = {name: asyncio.Queue(maxsize=max_queue) for name in clients}
+        self._tasks = {}
+        self._closed = asyncio.Event()  # set by close, cuts short any wait on a quarantine
+        return None
+
+    def start(self) -> None:
+        for name, client in self.clients.items():
+            self._tasks[name] = asyncio.create_task(self._deliver(name, client, self._queues[name]))
+        return None
+
+    def submit(self, player_name, record) -> None:
+        """Queues a round record for a player, never blocks the caller"""
+        try:
+            self._queues[player_name].put_nowait(record)
+        except asyncio.QueueFull:
+            self._dead_letter(player_name, [record], "queue full")
+        return None
+
+    async def close(self) -> None:
+        """Flushes every queued record and stops the delivery tasks"""
+        self._closed.set()
+        for name, queue in self._queues.items():
+            if not self._tasks[name].done():  # nothing reads the queue of a task that has died, it may be full
+                await queue.put(None)  # sentinel, everything queued before it is still delivered
+        results = await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        for name, result in zip(self._tasks, results):
+            if isinstance(result, Exception):
+                logger.error("Record delivery to " + name + " failed: " + repr(result))
+        logger.info("Record delivery drained, " + str(self.delivered) + " records delivered, " + str(self.dead_lettered) + " dead-lettered")
+        return None
+
+    async def _deliver(self, name, client, queue) -> None:
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            record = await queue.get()
+            if record is None:
+                break
+            batch = [record]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    if self.flush_interval > 0:
+                        record = await asyncio.wait_for(queue.get(), deadline - loop.time())
+                    else:
+                        record = queue.get_nowait()
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                if record is None:
+                    closing = True
+                    break
+                batch.append(record)
+            await self._send(name, client, batch)
+        return None
+
+    async def _send(self, name, client, batch) -> None:
+        attempt = 0
+        while True:
+            delay = self.backoff * (2 ** attempt)
+            quarantined = False
+            try:
+                if self._bulk[name]:
+                    try:
+                        await client.post("/records", {"records": batch})
+                    except RecordsPartiallyDelivered as e:  # only the records of the replicas that failed are sent again
+                        self.delivered += e.received
+                        batch = e.undelivered
+                        raise e.error
+                    self.delivered += len(batch)
+                else:
+                    while batch:  # records are dropped from the batch as they land so a retry never resends them
+                        await client.post("/record", batch[0])
+                        batch = batch[1:]
+                        self.delivered += 1
+                return None
+            except PlayerUnavailable as e:
+                error = repr(e)
+                if self._closed.is_set():
+                    break  # the tournament is over, don't hold it open waiting out the quarantine
+                delay = max(delay, client.retry_after())  # back off until the breaker lets requests through again
+                quarantined = True
+            except httpx.HTTPStatusError as e:
+                if self._bulk[name] and e.response.status_code in (404, 405):
+                    logger.info(name + " does not serve /records, falling back to /record")
+                    self._bulk[name] = False
+                    continue
+                error = "error response " + str(e.response.status_code)
+                if e.response.status_code < 500:
+                    break  # the player rejected the records, sending them again will not change that
+            except httpx.HTTPError as e:  # a 2xx is always a delivery, so nothing raised after one is retried
+                error = repr(e)
+            if attempt >= self.retries:
+                break
+            logger.warning("Failed to deliver " + str(len(batch)) + " round records to " + name + ": " + error)
+            if quarantined:
+                try:
+                    await asyncio.wait_for(self._closed.wait(), delay)  # woken by close, the next attempt dead-letters
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(delay)
+            attempt += 1
+        self._dead_letter(name, batch, error)
+        return None
+
+    def _dead_letter(self, player_name, records, reason) -> None:
+        self.dead_lettered += len(records)
+        logger.error("Dead-lettering " + str(len(records)) + " round records for " + player_name + ": " + reason)
+        if self.dead_letter_path:
+            with open(self.dead_letter_path, "a") as f:
+                for record in records:
+                    f.write(json.dumps({"player": player_name, "reason": reason, "record": record}) + "\n")
+        return None
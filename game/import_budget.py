@@ -0,0 +1,51 @@
+# import_budget.py
+# Checks that importing the game stays cheap, so spawning many short-lived game workers is fast.
+# Imports main in a fresh interpreter with -X importtime, reports the slowest imports
+# and exits non-zero if the cumulative import time of main is over budget.
+#
+# python import_budget.py --budget 300
+
+import argparse                     # for parsing command line arguments
+import os                           # for the directory main is imported from
+import subprocess                   # for importing main in a fresh interpreter
+import sys                          # for the python running the check and the exit code
+
+
+def measure(module, runs) -> tuple:
+    """Imports module runs times in fresh interpreters, returns the best total in ms and the slowest imports of that run"""
+    best_total, best_imports = None, []
+    for _ in range(0, runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True)
+        imports = []
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            imports.append((int(cumulative) / 1000, name.rstrip()))
+        total = next(ms for ms, name in imports if name.strip() == module)
+        if best_total is None or total < best_total:
+            best_total, best_imports = total, imports
+    return best_total, sorted(best_imports, reverse=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check the import time of the game against a budget.")
+    parser.add_argument('-b', '--budget', type=float, default=300.0, help='Most milliseconds importing main may take, default is 300.')
+    parser.add_argument('-r', '--runs', type=int, default=3, help='Imports measured, the fastest is compared to the budget, default is 3.')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports listed, default is 10.')
+    check_args = parser.parse_args()
+
+    total, imports = measure("main", check_args.runs)
+    for ms, name in imports[:check_args.top]:
+        print(f"{ms:8.1f} ms  {name}")
+    print(f"import main: {total:.1f} ms, budget {check_args.budget:.1f} ms")
+    if total > check_args.budget:
+        print("OVER BUDGET")
+        sys.exit(1)
+    return None
+
+
+if __name__ == "__main__":
+    main()
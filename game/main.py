@@ -1,91 +1,337 @@
 # main.py
 
 import argparse                     # for parsing command line arguments
+import asyncio                      # for requesting turns from all players concurrently
+import collections                  # for counting wins across a tournament
 import logging                      # for logging
+import os                           # for reading the tracing switch from the environment
 import uuid                         # for generating game ids
-import requests                     # for requesting turns from player apis
+import seeding                      # for deriving game ids, player ids and local turns from a run seed
+import httpx                        # for handling errors from the player apis
 import nanoid                       # for generating player ids
-import time                         # for sleeping between games
-from rich import print              # for pretty printing
-from rich.console import Console 
-from rich.columns import Columns
-from rich.panel import Panel
-from opentelemetry import trace
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
-from opentelemetry.instrumentation.requests import RequestsInstrumentor
-from opentelemetry.sdk.resources import SERVICE_NAME, Resource
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import (
-    BatchSpanProcessor,
-    ConsoleSpanExporter,
-)
+import time                         # for timing turns, rounds, games and tournaments
+from opentelemetry import trace     # the api only, the sdk and exporter are loaded by _setup_tracing when tracing is on
+from client import PlayerClient, ShardedPlayerClient, LocalPlayerClient, CircuitBreaker, PlayerUnavailable  # for pooled, keep-alive connections to the player apis, or local stand-ins
+from registry import load_players   # for the roster of players and their replicas
+from delivery import RecordDelivery # for posting round records to the players in the background
+from strategies import STRATEGIES   # for playing the players strategies in-process
+from results import RoundRecord, ResultsWriter  # for keeping and streaming compact game results
+from timings import RoundTimings    # for where round latency goes, phase by phase and player by player
+# rich is only loaded in interactive mode, by _get_console, the dashboard and the print functions
+
+
+# Nothing below runs anything at import time: logging, tracing and arguments are set up by main()
+# so importing this module to spawn game workers or run tests stays cheap and needs no collector.
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer("main-game")  # a proxy until _setup_tracing installs the provider, a no-op if it never does
+_console = None
+_span_processor = None  # set by _setup_tracing, counts the spans dropped by a full export queue
 
 
 # LOGGING SETUP
-logging.basicConfig(format='%(asctime)s,%(msecs)03d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
-                    datefmt='%Y-%m-%d:%H:%M:%S',
-                    filemode='w',
-                    level=logging.INFO)
-logger = logging.getLogger(__name__)
-RequestsInstrumentor().instrument()
+def _setup_logging(debug) -> None:
+    logging.basicConfig(format='%(asctime)s,%(msecs)03d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
+                        datefmt='%Y-%m-%d:%H:%M:%S',
+                        filemode='w',
+                        level=logging.INFO)
+    if debug:
+        logger.info("Debug mode enabled")
+        logger.setLevel(logging.DEBUG)
+    else:
+        logger.info("Debug mode disabled")
+        logger.setLevel(logging.INFO)
+        logging.getLogger("httpx").setLevel(logging.WARNING)  # httpx logs every request at INFO
+    return None
 
 # MANUAL TRACING SETUP
-resource = Resource(attributes={ SERVICE_NAME: "main_game" })
-provider = TracerProvider(resource=resource)
-processor = BatchSpanProcessor(OTLPSpanExporter(endpoint="agent:4317", insecure=True))
-provider.add_span_processor(processor)
-trace.set_tracer_provider(provider)
-tracer = trace.get_tracer("main-game")
+def _setup_tracing(args) -> None:
+    global _span_processor
+    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+    from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.sampling import ParentBased
+    from tracing import GameSampler, CountingBatchSpanProcessor
+    HTTPXClientInstrumentor().instrument()
+    resource = Resource(attributes={ SERVICE_NAME: "main_game" })
+    provider = TracerProvider(resource=resource, sampler=ParentBased(GameSampler(args.trace_sample_ratio)))  # all or nothing per game
+    batch_size = args.span_batch_size
+    if batch_size is None and args.span_queue_size is not None:
+        batch_size = min(512, args.span_queue_size)  # a batch can't be bigger than the queue
+    _span_processor = CountingBatchSpanProcessor(OTLPSpanExporter(endpoint="agent:4317", insecure=True),
+                                                 max_queue_size=args.span_queue_size,
+                                                 max_export_batch_size=batch_size,
+                                                 schedule_delay_millis=args.span_export_interval)
+    provider.add_span_processor(_span_processor)
+    trace.set_tracer_provider(provider)
+    return None
+
+def _get_console():
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
 
 # ARGUMENT PARSING
-logger.debug("Initializing application and parsing arguments") # Log the start of the application
-parser = argparse.ArgumentParser()  # Create the parser
-parser.add_argument('-i', '--interactive',  # Add an argument for interactive mode
-                    action='store_const',
-                    dest='interactive',
-                    const=True,
-                    default=False,
-                    required=False, 
-                    help='Add this option to run in interactive mode, default is non-interactive mode.')
-parser.add_argument('-d','--debug',  # Add an argument for debug mode
-                    action='store_const',
-                    dest='debug',
-                    const=True,
-                    default=False,
-                    required=False,
-                    help='Add this option to r un in debug mode, default is non-debug mode.')
-parser.add_argument('-n','--num_rounds',  # Add an argument for number of rounds
-                    action='store',
-                    dest='num_rounds',
-                    type=int,
-                    default=1,
-                    required=False,
-                    help='Add this option to specify the number of rounds to play, default is 1.')
-parser.add_argument('-t','--timeout',  # Add an argument for timeout between games
-                    action='store',
-                    dest='timeout',
-                    type=int,
-                    default=0,
-                    required=False,
-                    help='Add this option to specify the number of seconds to wait between games.')
-
-args = parser.parse_args()  # Parse the argument
-logger.debug("Application started with arguments: " + str(args)) # Log the arguments
-if args.debug:
-    logger.info("Debug mode enabled")
-    logger.setLevel(logging.DEBUG)
-else:
-    logger.info("Debug mode disabled")
-    logger.setLevel(logging.INFO)
-if args.interactive:
-    console = Console()
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()  # Create the parser
+    parser.add_argument('-i', '--interactive',  # Add an argument for interactive mode
+                        action='store_const',
+                        dest='interactive',
+                        const=True,
+                        default=False,
+                        required=False, 
+                        help='Add this option to run in interactive mode with a live dashboard of the tournament, default is non-interactive mode.')
+    parser.add_argument('-d','--debug',  # Add an argument for debug mode
+                        action='store_const',
+                        dest='debug',
+                        const=True,
+                        default=False,
+                        required=False,
+                        help='Add this option to r un in debug mode, default is non-debug mode.')
+    parser.add_argument('-n','--num_rounds',  # Add an argument for number of rounds
+                        action='store',
+                        dest='num_rounds',
+                        type=int,
+                        default=1,
+                        required=False,
+                        help='Add this option to specify the number of rounds to play, default is 1.')
+    parser.add_argument('-t','--timeout',  # Add an argument for timeout between games
+                        action='store',
+                        dest='timeout',
+                        type=int,
+                        default=0,
+                        required=False,
+                        help='Add this option to specify the number of seconds to wait between games.')
+    parser.add_argument('--turn_timeout',  # Add an argument for the per player turn timeout
+                        action='store',
+                        dest='turn_timeout',
+                        type=float,
+                        default=5.0,
+                        required=False,
+                        help='Add this option to specify the number of seconds to wait for a player to take their turn, retries included, default is 5.')
+    parser.add_argument('--pool_size',  # Add an argument for the connection pool size per player
+                        action='store',
+                        dest='pool_size',
+                        type=int,
+                        default=10,
+                        required=False,
+                        help='Add this option to specify the number of keep-alive connections kept open to each player, default is 10.')
+    parser.add_argument('--retries',  # Add an argument for the number of retries per request
+                        action='store',
+                        dest='retries',
+                        type=int,
+                        default=2,
+                        required=False,
+                        help='Add this option to specify how many times a failed player request is retried, default is 2.')
+    parser.add_argument('--backoff',  # Add an argument for the retry backoff
+                        action='store',
+                        dest='backoff',
+                        type=float,
+                        default=0.1,
+                        required=False,
+                        help='Add this option to specify the seconds to wait before the first retry, doubled on each retry, default is 0.1.')
+    parser.add_argument('-c','--concurrency',  # Add an argument for the number of games played at once
+                        action='store',
+                        dest='concurrency',
+                        type=int,
+                        default=1,
+                        required=False,
+                        help='Add this option to specify the number of games played at the same time, default is 1.')
+    parser.add_argument('--max_in_flight',  # Add an argument for the cap on concurrent player requests
+                        action='store',
+                        dest='max_in_flight',
+                        type=int,
+                        default=0,
+                        required=False,
+                        help='Add this option to cap the number of player requests in flight across all games, default is 0 (no cap).')
+    parser.add_argument('--record_batch_size',  # Add an argument for the number of round records posted per request
+                        action='store',
+                        dest='record_batch_size',
+                        type=int,
+                        default=50,
+                        required=False,
+                        help='Add this option to specify the most round records posted to a player in one request, default is 50.')
+    parser.add_argument('--record_flush_interval',  # Add an argument for how long round records wait to be batched
+                        action='store',
+                        dest='record_flush_interval',
+                        type=float,
+                        default=0.0,
+                        required=False,
+                        help='Add this option to specify the seconds a round record waits for a batch to fill, fewer and larger requests but python_player sees a game\'s rounds after it has moved on, default is 0 (sent at the end of its round).')
+    parser.add_argument('--record_queue_size',  # Add an argument for the bound on queued round records
+                        action='store',
+                        dest='record_queue_size',
+                        type=int,
+                        default=10000,
+                        required=False,
+                        help='Add this option to specify the most round records queued per player before they are dead-lettered, default is 10000.')
+    parser.add_argument('--dead_letter_file',  # Add an argument for where undeliverable round records are written
+                        action='store',
+                        dest='dead_letter_file',
+                        default=None,
+                        required=False,
+                        help='Add this option to append round records that could not be delivered to this file as json lines.')
+    parser.add_argument('--local',  # Add an argument for playing the players strategies in-process
+                        action='store_const',
+                        dest='local',
+                        const=True,
+                        default=False,
+                        required=False,
+                        help='Add this option to play the players strategies in-process instead of calling the player services.')
+    parser.add_argument('--simulate',  # Add an argument for the vectorized batch simulator
+                        action='store_const',
+                        dest='simulate',
+                        const=True,
+                        default=False,
+                        required=False,
+                        help='Add this option to play all of the games at once with the vectorized simulator, no player services are called.')
+    parser.add_argument('-r','--results',  # Add an argument for the results file
+                        action='store',
+                        dest='results',
+                        default=None,
+                        required=False,
+                        help='Add this option to append every finished game to this file as json lines.')
+    parser.add_argument('--store',  # Add an argument for the results store
+                        action='store',
+                        dest='store',
+                        default=None,
+                        required=False,
+                        help='Add this option to write every finished game, round and turn to this SQLite database, query it with store.py.')
+    parser.add_argument('--store_batch',  # Add an argument for the results store batch size
+                        action='store',
+                        dest='store_batch',
+                        type=int,
+                        default=500,
+                        required=False,
+                        help='Add this option to specify the games written to the store in one transaction, default is 500.')
+    parser.add_argument('--ready_timeout',  # Add an argument for the readiness probe timeout
+                        action='store',
+                        dest='ready_timeout',
+                        type=float,
+                        default=1.0,
+                        required=False,
+                        help='Add this option to specify the seconds a player has to answer its /ready probe, default is 1.')
+    parser.add_argument('--failure_threshold',  # Add an argument for the circuit breaker threshold
+                        action='store',
+                        dest='failure_threshold',
+                        type=int,
+                        default=5,
+                        required=False,
+                        help='Add this option to specify how many failed or slow requests in a row quarantine a player, default is 5.')
+    parser.add_argument('--latency_budget',  # Add an argument for the circuit breaker latency budget
+                        action='store',
+                        dest='latency_budget',
+                        type=float,
+                        default=1.0,
+                        required=False,
+                        help='Add this option to specify the seconds after which a player request counts as failed, default is 1.')
+    parser.add_argument('--quarantine',  # Add an argument for the circuit breaker cooldown
+                        action='store',
+                        dest='quarantine',
+                        type=float,
+                        default=5.0,
+                        required=False,
+                        help='Add this option to specify the seconds a failing player is left out of games before it is probed again, doubled on each trip in a row, default is 5.')
+    parser.add_argument('--player_wait',  # Add an argument for how long a game waits for enough players
+                        action='store',
+                        dest='player_wait',
+                        type=float,
+                        default=60.0,
+                        required=False,
+                        help='Add this option to specify the seconds a game waits for enough players to be available before the tournament is stopped, default is 60.')
+    parser.add_argument('--batch_turns',  # Add an argument for batching turn requests across games
+                        action='store_const',
+                        dest='batch_turns',
+                        const=True,
+                        default=False,
+                        required=False,
+                        help='Add this option to send the turn requests of concurrent games to each player together on its /turns endpoint.')
+    parser.add_argument('--batch_window',  # Add an argument for how long a turn waits for its batch
+                        action='store',
+                        dest='batch_window',
+                        type=float,
+                        default=0.002,
+                        required=False,
+                        help='Add this option to specify the seconds a turn request waits for others to batch with, default is 0.002.')
+    parser.add_argument('--metrics_port',  # Add an argument for serving live tournament statistics
+                        action='store',
+                        dest='metrics_port',
+                        type=int,
+                        default=0,
+                        required=False,
+                        help='Add this option to serve live tournament statistics as prometheus metrics on this port, default is 0 (off).')
+    parser.add_argument('-p','--players',  # Add an argument for the players config
+                        action='store',
+                        dest='players',
+                        default=None,
+                        required=False,
+                        help='Add this option to load the players and their replicas from this json config, see registry.py. MORRA_PLAYERS does the same, default is the three player services.')
+    parser.add_argument('-s','--seed',  # Add an argument for a reproducible run
+                        action='store',
+                        dest='seed',
+                        type=int,
+                        default=None,
+                        required=False,
+                        help='Add this option to derive game ids, player ids and in-process turns from this seed so the run can be reproduced. Start python_player with the same MORRA_SEED.')
+    parser.add_argument('--trace_sample_ratio',  # Add an argument for head sampling games
+                        action='store',
+                        dest='trace_sample_ratio',
+                        type=float,
+                        default=float(os.environ.get("MORRA_TRACE_SAMPLE_RATIO", "1.0")),
+                        required=False,
+                        help='Add this option to trace this fraction of the games, each game is traced in full or not at all. MORRA_TRACE_SAMPLE_RATIO does the same, default is 1.')
+    parser.add_argument('--span_batch_size',  # Add an argument for the span export batch size
+                        action='store',
+                        dest='span_batch_size',
+                        type=int,
+                        default=None,
+                        required=False,
+                        help='Add this option to specify the most spans exported in one batch, default is OTEL_BSP_MAX_EXPORT_BATCH_SIZE or 512.')
+    parser.add_argument('--span_queue_size',  # Add an argument for the span export queue size
+                        action='store',
+                        dest='span_queue_size',
+                        type=int,
+                        default=None,
+                        required=False,
+                        help='Add this option to specify the most spans queued for export, spans are dropped beyond it, default is OTEL_BSP_MAX_QUEUE_SIZE or 2048.')
+    parser.add_argument('--span_export_interval',  # Add an argument for the span export interval
+                        action='store',
+                        dest='span_export_interval',
+                        type=float,
+                        default=None,
+                        required=False,
+                        help='Add this option to specify the milliseconds between span exports, default is OTEL_BSP_SCHEDULE_DELAY or 5000.')
+    parser.add_argument('--profile',  # Add an argument for profiling the run
+                        action='store',
+                        dest='profile',
+                        default=None,
+                        required=False,
+                        help='Add this option to run under cProfile and write the stats to this file, read them with python -m pstats.')
+    parser.add_argument('--no_tracing',  # Add an argument for turning tracing off
+                        action='store_const',
+                        dest='tracing',
+                        const=False,
+                        default=os.environ.get("MORRA_TRACING", "1") != "0",
+                        required=False,
+                        help='Add this option to run without tracing, no spans are exported to the collector. MORRA_TRACING=0 does the same.')
+
+    return parser.parse_args(argv)  # Parse the arguments
+
+# PLAYER SERVICES
+PLAYER_SERVICES = {"python_player": "http://python_player:80",  # the default roster, see registry.py for other players and replicas
+                   "go_player": "http://go_player:80",
+                   "node_player": "http://node_player:80"}
+MIN_PLAYERS = 2  # a game needs at least this many healthy players
+MAX_SHORT_ROUNDS = 5  # rounds in a row that fewer than MIN_PLAYERS players take part in before a game is abandoned
 
 
 class Player:
-    def __init__(self, player_name, player_url) -> None:
-        self.player_id = nanoid.generate(size=8)
+    def __init__(self, player_name, client, player_id=None) -> None:
+        self.player_id = nanoid.generate(size=8) if player_id is None else player_id
         self.player_name = player_name
-        self.player_url = player_url
+        self.client = client
         self.score = 0
         return None
 
@@ -101,7 +347,7 @@ class Player:
 
     # @tracer.start_as_current_span("player_get_url")
     def get_url(self) -> str:
-        return self.player_url
+        return self.client.get_url()
 
     # @tracer.start_as_current_span("player_get_name")
     def get_name(self) -> str:
@@ -111,122 +357,161 @@ class Player:
     def get_score(self) -> int:
         return self.score
 
+    def get_client(self) -> PlayerClient:
+        return self.client
+
 class Game:
-    def __init__(self) -> None:
-        self.game_id = uuid.uuid4()
-        with tracer.start_as_current_span("game_init") as game_init_span:
+    """
+    Defines a game between the players of each client.
+    A game is made up of rounds and continues until a player reaches three points.
+    Observers are told about every finished round and game through their on_round(round)
+    and on_game(game) methods, while the round or game is still complete in memory.
+    """
+    def __init__(self, clients, delivery=None, observers=(), game_id=None, seed=None, turn_timeout=None) -> None:
+        self.game_id = uuid.uuid4() if game_id is None else game_id
+        self.seed = seed
+        self.turn_timeout = turn_timeout
+        self.clients = clients
+        self.delivery = delivery
+        self.observers = observers
+        self.latency = 0.0
+        # game_init is kept open until the game has been played, game_play runs inside it as it always has,
+        # so a game is one trace. The sampler decides on the game id.
+        self._game_init_span = tracer.start_span("game_init", attributes={"game.id": str(self.game_id)})
+        with trace.use_span(self._game_init_span, end_on_exit=False) as game_init_span:
             logger.debug("Initializing game")
-            game_init_span.set_attribute("game.id", str(self.game_id))
             self.round_no = 0
             self.players = []
             self.rounds = []
+            self.winner = None
             logger.info("Game " + str(self.game_id) + " started")
             logger.debug("Trying to add players to game")
             self._add_player()
             self.player_count = len(self.players)
             game_init_span.set_attribute("game.player_count", self.player_count)
-            logger.debug("Trying to start game play")
-            self.play()
             return None
     
     # @tracer.start_as_current_span("game_add_player")
     def _add_player(self) -> None:
         logger.debug("Adding players to game")
-        self.players.append(Player("python_player", "http://python_player:80"))
-        self.players.append(Player("go_player", "http://go_player:80"))
-        self.players.append(Player("node_player", "http://node_player:80"))
+        for name, client in self.clients.items():
+            player_id = None if self.seed is None else seeding.player_id(self.seed, self.game_id, name)
+            self.players.append(Player(name, client, player_id))
         logger.debug("Players added to game")
         return None
     
-    # @tracer.start_as_current_span("_game_print_game_summary")
-    def _print_game_summary(self) -> None:
-        logger.debug("Printing game summary")
-        panels = []  # create list of panels
-        panels.append(Panel(f"WINNER!\n", expand=True, width=20))  # add round total panel
-        for p in self.players:
-            a = f"[green]{p.get_name()}[/green]" if p.get_score() == 3 else f"[white]{p.get_name()}[/white]"  # set colour of player name if they guessed correctly
-            b = f"[green]Final Score: {str(p.get_score())}[/green]" if p.get_score() == 3 else f"Final Score: {str(p.get_score())}"
-            c = a + "\n" + b  # set panel text
-            panels.append(Panel(c, expand=True, width=30))  # add panel to list
-        
-        console.print(Columns(panels))  # print the panels
-        return None
-
-    def play(self):
-        with tracer.start_as_current_span("game_play") as game_play:
+    async def play(self) -> None:
+        with trace.use_span(self._game_init_span, end_on_exit=True), \
+             tracer.start_as_current_span("game_play", attributes={"game.id": str(self.game_id)}) as game_play:
 
             logger.debug("Starting game play")
+            start = time.perf_counter()
 
             winner = False
+            short_rounds = 0
             while not winner:
                 self.round_no += 1
                 logger.debug("Trying to start round")
                 logger.debug("Round: " + str(self.round_no))
-                round = Round(self.game_id, self.round_no, self.players)
-                self.rounds.append(round)
+                round = Round(self.game_id, self.round_no, self.players, self.delivery, self.turn_timeout)
+                await round.play()
+                self.rounds.append(round.get_record())  # keep the outcome, not the round that played it
+                for o in self.observers:
+                    o.on_round(round)
+
+                if round.played() < MIN_PLAYERS:  # a player left on their own can never call the total of the others
+                    short_rounds += 1
+                    available = sum(1 for p in self.players if not p.get_client().quarantined())
+                    if available < MIN_PLAYERS or short_rounds >= MAX_SHORT_ROUNDS:
+                        logger.error("Only " + str(round.played()) + " players played round " + str(self.round_no) + " and " + str(available) + " are available, abandoning game " + str(self.game_id))
+                        game_play.set_attribute("game.abandoned", True)
+                        break
+                else:
+                    short_rounds = 0
                 logger.debug("Round complete")
 
                 logger.debug("Checking for game winners")
                 for p in self.players:
                     if p.score == 3:
                         logger.debug("Game won by " + p.get_name())
-                        if args.interactive:
-                            self._print_game_summary()
                         winner = True
+                        self.winner = p.get_name()
                         game_play.set_attribute("game.winner", p.player_name)
 
                         break
-                    
+
+            self.latency = time.perf_counter() - start
             logger.debug("Game over")
+            for o in self.observers:
+                o.on_game(self)
 
             return None
 
+    def get_winner(self) -> str:
+        return self.winner
+
+    def get_player_names(self) -> list:
+        return [p.get_name() for p in self.players]
+
     # @tracer.start_as_current_span("game_get_summary")
     def get_summary(self) -> list:
         round_list = []
+        player_names = self.get_player_names()
         for r in self.rounds:
-            round_list.append(r.get_round_dict())
+            round_list.append(r.get_round_dict(self.game_id, player_names))
         return round_list
 
 class Round:
     """
     Defines a round within a game.
     A round is made up of a number of turns.
-    The init will start the roound and create a turn object for each player.
-    Then it will judge the results of the round.
+    The init will set up the round, play will create a turn object for each player,
+    request all of the turns concurrently and then judge the results of the round.
     """
-    def __init__(self, game_id, round_no, players) -> None:
-        with tracer.start_as_current_span("round_init") as round_init_span:
+    def __init__(self, game_id, round_no, players, delivery=None, turn_timeout=None) -> None:
+        logger.debug("Initializing round")
+        self.turns = []
+        self.game_id = game_id
+        self.round_no = round_no
+        self.player_count = len(players)
+        self.throw_total = 0
+        self.correct_guesses = 0
+        self.players = players
+        self.delivery = delivery
+        self.turn_timeout = turn_timeout
+        self.latency = 0.0
+        self.phases = {}  # seconds spent in each phase of play, see timings.py
+        return None
 
-            # Initialize the round and set trace attributes
-            logger.debug("Initializing round")
-            self.turns = []
-            self.game_id = game_id
+    async def play(self) -> None:
+        with tracer.start_as_current_span("round_init", attributes={"game.id": str(self.game_id)}) as round_init_span:
+
+            # Set trace attributes
             round_init_span.set_attribute("round.game_id", str(self.game_id))
-            self.round_no = round_no
             round_init_span.set_attribute("round.round_no", self.round_no)
-            self.player_count = len(players)
             round_init_span.set_attribute("round.player_count", self.player_count)
-            self.throw_total = 0
-            self.correct_guesses = 0
-            self.players = players
 
-            # Play the round
+            # Play the round, timing each phase
+            start = time.perf_counter()
             logger.debug("Starting round - taking turns")
-            self._take_turns()              # call the web services to get each players throw and call
+            await self._take_turns()        # call the web services to get each players throw and call
+            turns_taken = time.perf_counter()
             logger.debug("Judging round - totalling throws and checking calls")
             self._total_throws()            # judge the results
             self._check_calls()             # check guesses against round total
-            self._post_summary()            # post the round summary to the players
-            if args.interactive: self._print_round_summary()
+            judged = time.perf_counter()
+            self._post_summary()            # queue the round summary for the players
+            posted = time.perf_counter()
+            self.phases = {"take_turns": turns_taken - start, "judge": judged - turns_taken, "post_summary": posted - judged}
+            self.latency = posted - start
             return None
 
-    def _take_turns(self) -> None:
+    async def _take_turns(self) -> None:
         for i in range(0, self.player_count):
             logger.debug("Requesting turn " + str(i+1))
-            turn = Turn(self.game_id, self.round_no, self.players[i])
-            self.turns.append(turn)
-            logger.debug("Turn " + str(i+1) + " complete")
+            self.turns.append(Turn(self.game_id, self.round_no, self.players[i], self.player_count, self.turn_timeout))
+        await asyncio.gather(*(t.take() for t in self.turns))  # round latency is the slowest player, not the sum
+        logger.debug("All " + str(self.player_count) + " turns complete")
         return None
 
     # @tracer.start_as_current_span("round_total_throws")
@@ -246,6 +531,12 @@ class Round:
                 self.turns[i].get_player().win()
         return None
 
+    def get_record(self) -> RoundRecord:
+        return RoundRecord(self.round_no,
+                           tuple(t.throw for t in self.turns),
+                           tuple(t.call for t in self.turns),
+                           self.throw_total)
+
     # @tracer.start_as_current_span("round_get_round_dict")
     def get_round_dict(self) -> dict:
         turn_dicts = []
@@ -258,65 +549,67 @@ class Round:
                       }
         return round_dict
 
+    def played(self) -> int:
+        """The number of players that took their turn, rather than forfeiting it"""
+        return sum(1 for t in self.turns if not t.forfeit)
+
     def get_round_total(self) -> int:
         return self.throw_total
     
     def _post_summary(self) -> None:
-        logger.debug("Posting round summary")
+        if self.delivery is None:
+            return None
+        logger.debug("Queueing round summary")
         _round_record = self.get_round_dict()
-        for i in range(0, self.player_count):
-            logger.debug("Posting round record to player " + str(i+1))
-            try:
-                self._response = requests.post(self.players[i].get_url()+"/record/", json=_round_record)
-                _status_code = self._response.status_code
-                _json_response = self._response.json()
-            except requests.exceptions.Timeout:
-                # Maybe set up for a retry, or continue in a retry loop
-                logger.error("Timeout error posting round record to player " + str(i+1))
-            except requests.exceptions.TooManyRedirects:
-                # Tell the user their URL was bad and try a different one
-                logger.error("Too many redirects error posting round record to player " + str(i+1))
-            except requests.exceptions.RequestException as e:
-                # catastrophic error. bail.
-                logger.error("Catastrophic error posting round record to player " + str(i+1))
-        return None
-
-    def _print_round_summary(self) -> None:
-        r = self.get_round_dict()     # get round outcomes
-        tot = self.get_round_total()  # get round total
-        panels = []  # build empty panel list
-        panels.append(Panel(f"[bold]Round {r['round_no']}[/bold]\nTotal {tot}", expand=True, width=20))  # add round total panel
-        for t in r["turns"]:  # add a panel for each turn
-            a = f"[green]{t['player_id']}[/green]" if tot == t["call"] else f"[white]{t['player_id']}[/white]"  # set colour of player name if they guessed correctly
-            b = f"Throw: {str(t['throw'])} Call: {str(t['call'])}"  # set throw and call text
-            c = a + "\n" + b  # set panel text
-            panels.append(Panel(c, expand=True, width=30))  # add panel to list
-        
-        console.print(Columns(panels))  # print the panels
+        for p in self.players:
+            self.delivery.submit(p.get_name(), _round_record)  # delivered in the background, never waits on the players
         return None
 
 class Turn:
     """
     Defines a turn which is made up of a call (guess) and a throw (fingers).
     One turn corresponds to the play of a single player.
-    init will start the turn and request the turn from the players api.
+    init will set up the turn, take will request the turn from the players api.
+    A player that fails to respond within turn_timeout seconds, queueing and retries included,
+    forfeits the turn, a forfeited turn throws nothing and its call can never win.
     """
     # @tracer.start_as_current_span("turn_init")
-    def __init__(self, game_id, round_no, player) -> None:
+    def __init__(self, game_id, round_no, player, player_count, turn_timeout=None) -> None:
         logger.debug("Initializing turn")
         self.game_id = game_id
         self.round_no = round_no
         self.player = player
+        self.player_count = player_count
+        self.turn_timeout = turn_timeout
+        self.throw = 0
+        self.call = None
+        self.forfeit = False
+        self.latency = 0.0
+        return None
+
+    async def take(self) -> None:
         logger.debug("Generating Request Body")
         request_body = {"reqgameid": str(self.game_id),
                         "reqroundno": self.round_no,
-                        "reqplayercount": 2}
+                        "reqplayercount": self.player_count}
         logger.debug("Request body: " + str(request_body))
-        logger.debug("Requesting turn from player " + self.player.get_name() + " at " + self.player.get_url() + "/turn/")
-        self._response = requests.post(player.get_url()+"/turn/", json=request_body).json()
-        logger.debug("Request response: " + str(self._response))
-        self.throw = self._response["resthrow"]
-        self.call = self._response["rescall"]
+        logger.debug("Requesting turn from player " + self.player.get_name() + " at " + self.player.get_url() + "/turn")
+        start = time.perf_counter()
+        try:
+            self._response = await asyncio.wait_for(self.player.get_client().turn(request_body), self.turn_timeout)
+            logger.debug("Request response: " + str(self._response))
+            self.throw = self._response["resthrow"]
+            self.call = self._response["rescall"]
+        except PlayerUnavailable:
+            logger.debug("Player " + self.player.get_name() + " is quarantined, turn forfeited")
+            self.forfeit = True
+        except (httpx.TimeoutException, asyncio.TimeoutError):
+            logger.error("Timeout error requesting turn from player " + self.player.get_name())
+            self.forfeit = True
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            logger.error("Error requesting turn from player " + self.player.get_name() + ": " + str(e))
+            self.forfeit = True
+        self.latency = time.perf_counter() - start
         return None
 
     # @tracer.start_as_current_span("turn_get_turn_dict")
@@ -333,18 +626,218 @@ class Turn:
 
 
 # @tracer.start_as_current_span("main")
-def main():
+def main(argv=None):
     """
     make a game object this will store the record of game
     a game is made up of a variable number of rounds
     a game continues until one player reaches three points
     a point is earned by winning a round
     """
+    args = _parse_args(argv)
+    _setup_logging(args.debug)
+    logger.debug("Application started with arguments: " + str(args)) # Log the arguments
+    if args.tracing and not args.simulate:
+        _setup_tracing(args)
+    run = simulate_games if args.simulate else lambda args: asyncio.run(play_games(args))
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(run, args)
+        finally:
+            profiler.dump_stats(args.profile)
+            logger.info("Profile written to " + args.profile)
+    else:
+        run(args)
+    return None
+
+def simulate_games(args) -> None:
+    """
+    play all of the games at once with the vectorized simulator
+    """
+    import numpy as np  # numpy is only needed for simulation
+    from simulate import simulate
+    from strategies import BATCH_STRATEGIES
+    players = load_players(args.players, PLAYER_SERVICES)
+    _check_strategies(players, BATCH_STRATEGIES)
+    start = time.perf_counter()
+    results = simulate(list(players), args.num_rounds, len(players), rng=np.random.default_rng(args.seed),
+                       strategy_names=[p.strategy for p in players.values()])
+    _print_win_table(collections.Counter(results["wins"]), time.perf_counter() - start, args.interactive)
+    played = sum(results["rounds_per_game"].values())
+    mean = sum(rounds * count for rounds, count in results["rounds_per_game"].items()) / played if played else 0
+    logger.info("Games lasted " + f"{mean:.2f}" + " rounds on average, the longest lasted " + str(max(results["rounds_per_game"], default=0)) + " rounds")
+    return None
+
+async def play_games(args) -> None:
+    """
+    play the games as a tournament on a single event loop
+    concurrency workers each play games one after another until num_rounds games have been played
+    the player clients are created once so their pooled connections are kept alive between games
+    """
+    limiter = asyncio.Semaphore(args.max_in_flight) if args.max_in_flight > 0 else None
+    players = load_players(args.players, PLAYER_SERVICES)
+    if args.local:
+        _check_strategies(players, STRATEGIES)
+        clients = {name: LocalPlayerClient(name, STRATEGIES[p.strategy], seed=args.seed) for name, p in players.items()}
+    else:
+        clients = {name: _player_client(args, p, limiter) for name, p in players.items()}
+    await _check_ready(clients)
+    delivery = RecordDelivery(clients,
+                              batch_size=args.record_batch_size,
+                              flush_interval=args.record_flush_interval,
+                              max_queue=args.record_queue_size,
+                              dead_letter_path=args.dead_letter_file)
+    delivery.start()
+    writers = []
+    if args.results:
+        writers.append(ResultsWriter(args.results))
+    if args.store:
+        from store import ResultsStore  # sqlite3 is only needed when games are stored
+        writers.append(ResultsStore(args.store, batch_games=args.store_batch))
+    timings = RoundTimings()
+    observers = [timings]
+    if args.metrics_port or args.interactive:
+        from stats import TournamentStats  # prometheus_client is only needed when metrics are served or shown
+        stats = TournamentStats(export=bool(args.metrics_port))
+        observers.append(stats)
+        if args.metrics_port:
+            stats.serve(args.metrics_port)
+            logger.info("Serving tournament statistics on port " + str(args.metrics_port))
+            if _span_processor is not None:
+                stats.track_spans(_span_processor)
+    dashboard = None
+    if args.interactive:
+        from dashboard import Dashboard  # rich is only needed in interactive mode
+        dashboard = Dashboard(stats, timings, args.num_rounds)
+        observers.append(dashboard)
+        dashboard.start()
+    wins = collections.Counter({name: 0 for name in clients})
+    games = iter(range(0, args.num_rounds))  # shared by the workers, each game is taken by exactly one worker
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(_game_worker(args, clients, delivery, writers, observers, games, wins) for _ in range(0, max(1, args.concurrency))))
+    finally:
+        # every step runs even if an earlier one fails, so results are flushed and connections closed whatever happened
+        steps = [dashboard.close] if dashboard is not None else []
+        steps += [delivery.close] + [writer.close for writer in writers] + [client.aclose for client in clients.values()]
+        for step in steps:
+            try:
+                result = step()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error("Failed to close " + repr(step.__self__) + ": " + repr(e))
+        _print_win_table(wins, time.perf_counter() - start, args.interactive)
+        _print_timings(timings, args.interactive)
+        if _span_processor is not None and _span_processor.dropped:
+            logger.warning(str(_span_processor.dropped) + " spans were dropped by a full export queue, raise --span_queue_size or lower --trace_sample_ratio")
+    return None
 
-    for i in range(0, args.num_rounds):
-        game = Game()
-        time.sleep(args.timeout)
+def _check_strategies(players, strategies) -> None:
+    """
+    raises ValueError if a player has no strategy to stand in for it locally
+    """
+    for name, p in players.items():
+        if p.strategy not in strategies:
+            raise ValueError("Player " + name + " has no strategy " + p.strategy + ", set one of " + ", ".join(strategies) + " in the players config")
+    return None
+
+def _player_client(args, player, limiter):
+    """
+    returns the client for a player service, balanced across its replicas if it has more than one
+    every replica gets its own connection pool and circuit breaker
+    """
+    replicas = [(PlayerClient(url,
+                              pool_size=args.pool_size,
+                              retries=args.retries,
+                              backoff=args.backoff,
+                              timeout=args.turn_timeout,
+                              limiter=limiter,
+                              breaker=CircuitBreaker(failure_threshold=args.failure_threshold,
+                                                     latency_budget=args.latency_budget,
+                                                     cooldown=args.quarantine),
+                              ready_timeout=args.ready_timeout,
+                              batch_turns=args.batch_turns,
+                              batch_window=args.batch_window), weight)
+                for url, weight in player.replicas]
+    if len(replicas) == 1:
+        return replicas[0][0]
+    return ShardedPlayerClient(replicas)
+
+async def _check_ready(clients) -> None:
+    """
+    probe every player once before the tournament starts, players that are not ready are quarantined
+    """
+    names = list(clients)
+    ready = await asyncio.gather(*(clients[name].ready() for name in names))
+    for name, is_ready in zip(names, ready):
+        if is_ready:
+            logger.info(name + " is ready")
+        else:
+            logger.warning(name + " is not ready, quarantined")
+            clients[name].quarantine()
+    return None
+
+async def _available_clients(clients) -> dict:
+    """
+    returns the clients of the players healthy enough to take part in the next game
+    """
+    names = list(clients)
+    available = await asyncio.gather(*(clients[name].probe() for name in names))
+    return {name: clients[name] for name, ok in zip(names, available) if ok}
+
+async def _game_worker(args, clients, delivery, writers, observers, games, wins) -> None:
+    for index in games:
+        available = await _available_clients(clients)
+        deadline = time.monotonic() + args.player_wait
+        while len(available) < MIN_PLAYERS:  # wait for players rather than use up the game, so exactly num_rounds games are played
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.error("Only " + str(len(available)) + " players available after waiting " + str(args.player_wait) + "s, stopping before game " + str(index))
+                return None
+            logger.error("Only " + str(len(available)) + " players available, waiting to play game " + str(index))
+            await asyncio.sleep(min(max(args.timeout, args.quarantine), remaining))
+            available = await _available_clients(clients)
+        game_id = None if args.seed is None else seeding.game_id(args.seed, index)
+        game = Game(available, delivery, observers, game_id=game_id, seed=args.seed, turn_timeout=args.turn_timeout)
+        await game.play()
+        if game.get_winner() is not None:
+            wins[game.get_winner()] += 1
+        for writer in writers:
+            writer.write_game(game)  # the game is dropped after this, only the win count is kept
+        await asyncio.sleep(args.timeout)
+    return None
+
+def _print_win_table(wins, elapsed, interactive=False) -> None:
+    played = sum(wins.values())
+    logger.info("Tournament complete, " + str(played) + " games in " + f"{elapsed:.2f}" + "s (" + f"{played / elapsed if elapsed else 0:.1f}" + " games/sec)")
+    for name, count in wins.most_common():
+        logger.info(name + " won " + str(count) + " games (" + f"{100 * count / played if played else 0:.1f}" + "%)")
+    if interactive:
+        from rich.table import Table
+        table = Table(title="Tournament: " + str(played) + " games")
+        table.add_column("Player")
+        table.add_column("Wins", justify="right")
+        table.add_column("Win %", justify="right")
+        for name, count in wins.most_common():
+            table.add_row(name, str(count), f"{100 * count / played if played else 0:.1f}")
+        _get_console().print(table)
+    return None
 
+def _print_timings(timings, interactive=False) -> None:
+    rows = timings.summary()
+    logger.info("Round timings in ms: count, mean, p50, p95, p99, max")
+    for name, count, *ms in rows:
+        logger.info(name + ": " + str(count) + ", " + ", ".join(f"{v:.3f}" for v in ms))
+    if interactive:
+        from rich.table import Table
+        table = Table(title="Round timings (ms)")
+        for column in ("Timer", "Count", "Mean", "p50", "p95", "p99", "Max"):
+            table.add_column(column, justify="left" if column == "Timer" else "right")
+        for name, count, *ms in rows:
+            table.add_row(name, str(count), *(f"{v:.3f}" for v in ms))
+        _get_console().print(table)
     return None
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+# registry.py
+# The roster of players in a tournament, loaded from a json config instead of being fixed in the code.
+# Each player has a name, one or more weighted replicas of its service and the strategy that stands in
+# for it with --local and --simulate. The config is read from the --players file, or from MORRA_PLAYERS
+# which holds either the json itself or the path of a file. Without either the default roster is used.
+#
+# {"players": [
+#     {"name": "python_player", "replicas": [{"url": "http://python_player_1:80", "weight": 2},
+#                                             {"url": "http://python_player_2:80", "weight": 1}]},
+#     {"name": "go_player", "url": "http://go_player:80"},
+#     {"name": "node_player", "url": "http://node_player:80", "strategy": "node_player"}
+# ]}
+#
+# A replica is a url or {"url": ..., "weight": ...}, the weight defaults to 1. "url" is shorthand for one replica.
+# The name is the player id the service answers as and records its turns under, so it should match the service.
+
+import json                         # for reading the config
+import os                           # for the config in the environment
+
+
+class PlayerEntry:
+    __slots__ = ("name", "replicas", "strategy")
+
+    def __init__(self, name, replicas, strategy=None) -> None:
+        self.name = name
+        self.replicas = replicas  # [(url, weight), ...]
+        self.strategy = name if strategy is None else strategy
+        return None
+
+
+def load_players(path=None, default=None) -> dict:
+    """Loads the roster from path, MORRA_PLAYERS or default, in that order
+
+    Args:
+        path (str): a json config file, see above
+        default (dict): player name to url, used when there is no config
+
+    Returns:
+        dict: player name to PlayerEntry, in roster order
+    """
+    if path is not None:
+        with open(path) as f:
+            return parse_players(json.load(f))
+    config = os.environ.get("MORRA_PLAYERS", "").strip()
+    if config.startswith("{"):
+        return parse_players(json.loads(config))
+    if config:
+        with open(config) as f:
+            return parse_players(json.load(f))
+    return {name: PlayerEntry(name, [(url, 1.0)]) for name, url in (default or {}).items()}
+
+
+def parse_players(config) -> dict:
+    """Builds the roster from a parsed config, raises ValueError if the config is not valid"""
+    players = {}
+    for player in config.get("players", []):
+        name = player.get("name")
+        if not name:
+            raise ValueError("Player without a name in the players config: " + json.dumps(player))
+        if name in players:
+            raise ValueError("Player " + name + " is in the players config more than once")
+        replicas = player.get("replicas", [player["url"]] if "url" in player else [])
+        if not replicas:
+            raise ValueError("Player " + name + " has no url or replicas in the players config")
+        entries = []
+        for replica in replicas:
+            url, weight = (replica, 1.0) if isinstance(replica, str) else (replica["url"], float(replica.get("weight", 1.0)))
+            if weight <= 0:
+                raise ValueError("Replica " + url + " of player " + name + " must have a positive weight")
+            entries.append((url, weight))
+        players[name] = PlayerEntry(name, entries, player.get("strategy"))
+    if len(players) < 2:
+        raise ValueError("The players config must have at least 2 players")
+    return players
@@ -0,0 +1,120 @@
+# replay.py
+# Replays the turns of a results file (main.py --results) against the player services at a controlled rate.
+# Every recorded (game, round, player) turn is sent to that player's /turn as the game sent it, so a captured
+# or seeded tournament becomes a repeatable load test. With --rps the turns are sent open loop on a fixed
+# schedule and latency is measured from each turn's scheduled time, so a slow player can't slow the load down
+# and hide its own queueing. --verify counts replayed throws that differ from the recorded ones, which is
+# zero when the players run with the MORRA_SEED the results were recorded with. Only python_player honours
+# MORRA_SEED, the throws of the other players are replayed but never compared.
+#
+# python main.py --seed 42 -n 500 --results results.jsonl
+# python replay.py results.jsonl --rps 200 --max_in_flight 64 --output replay.json
+# python replay.py results.jsonl --player python_player=http://localhost:8080 --verify
+
+import argparse                     # for parsing command line arguments
+import asyncio                      # for sending turns concurrently
+import json                         # for the results file
+import sys                          # for the exit code on mismatched throws
+import time                         # for the send schedule and latency
+import httpx                        # for the player apis
+from benchmark import percentiles
+from results import read_games
+
+
+SEEDED_PLAYERS = ("python_player",)  # the players that honour MORRA_SEED, so their replayed throws can be verified
+
+
+def recorded_turns(path, players):
+    """Yields (player_name, request_body, recorded_throw) for every turn in the results file taken by one of players"""
+    for game in read_games(path):
+        names = game["players"]
+        for round_no, throws in enumerate(game["throws"], start=1):
+            for name, throw in zip(names, throws):
+                if name not in players:
+                    continue
+                yield name, {"reqgameid": game["game_id"], "reqroundno": round_no, "reqplayercount": len(names)}, throw
+
+
+async def replay(path, players, rps, max_in_flight, timeout) -> dict:
+    """Sends every recorded turn of players, rps per second (0 is as fast as max_in_flight allows)"""
+    latencies = {name: [] for name in players}
+    counts = {"turns": 0, "errors": 0, "mismatched": 0, "forfeited": 0, "unverified": 0}
+    in_flight = asyncio.Semaphore(max_in_flight)
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    clients = {name: httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) for name, url in players.items()}
+
+    async def send(name, body, recorded_throw, scheduled) -> None:
+        try:
+            response = await clients[name].post("/turn", json=body)
+            response.raise_for_status()
+            throw = response.json()["resthrow"]
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            counts["errors"] += 1
+            print("Turn " + body["reqgameid"] + "/" + str(body["reqroundno"]) + " to " + name + " failed: " + repr(e), file=sys.stderr)
+            return None
+        finally:
+            in_flight.release()
+        latencies[name].append(time.perf_counter() - scheduled)
+        if recorded_throw == 0:
+            counts["forfeited"] += 1  # the recorded turn was forfeited, there is no throw to compare
+        elif name not in SEEDED_PLAYERS:
+            counts["unverified"] += 1  # the player throws at random whatever the seed
+        elif throw != recorded_throw:
+            counts["mismatched"] += 1
+        return None
+
+    tasks = []
+    start = time.perf_counter()
+    try:
+        for i, (name, body, recorded_throw) in enumerate(recorded_turns(path, players)):
+            scheduled = time.perf_counter()
+            if rps > 0:
+                scheduled = start + i / rps
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await in_flight.acquire()
+            counts["turns"] += 1
+            tasks.append(asyncio.create_task(send(name, body, recorded_throw, scheduled)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    finally:
+        await asyncio.gather(*(client.aclose() for client in clients.values()))
+
+    return dict(counts,
+                elapsed_sec=elapsed,
+                turns_per_sec=counts["turns"] / elapsed if elapsed else 0.0,
+                players={name: percentiles(samples) for name, samples in latencies.items()})
+
+
+def main() -> None:
+    import main as game
+    parser = argparse.ArgumentParser(description="Replay the turns of a results file against the player services.")
+    parser.add_argument('results', help='Results file written by main.py --results.')
+    parser.add_argument('-p', '--player', action='append', default=[], help='name=url of a player to replay against, repeatable, default is every player service of main.py.')
+    parser.add_argument('--rps', type=float, default=0.0, help='Turns sent per second on a fixed schedule, default 0 sends as fast as --max_in_flight allows.')
+    parser.add_argument('--max_in_flight', type=int, default=32, help='Most turns awaiting a response at once, default is 32.')
+    parser.add_argument('--timeout', type=float, default=5.0, help='Seconds before a turn request times out, default is 5.')
+    parser.add_argument('--verify', action='store_true', help='Exit non-zero if any replayed throw of a seeded player differs from the recorded one.')
+    parser.add_argument('-o', '--output', default=None, help='File the results are written to as json.')
+    replay_args = parser.parse_args()
+
+    players = dict(p.split("=", 1) for p in replay_args.player) if replay_args.player else dict(game.PLAYER_SERVICES)
+    result = asyncio.run(replay(replay_args.results, players, replay_args.rps, replay_args.max_in_flight, replay_args.timeout))
+
+    print(f"{result['turns']} turns in {result['elapsed_sec']:.2f} sec, {result['turns_per_sec']:.1f} turns/sec, {result['errors']} errors")
+    for name, p in result["players"].items():
+        print(f"{name:>14}: p50/p95/p99 {p['p50_ms']:.2f}/{p['p95_ms']:.2f}/{p['p99_ms']:.2f} ms over {p['count']} turns")
+    print(f"{result['mismatched']} replayed throws differ from the recorded ones, {result['forfeited']} recorded turns were forfeited, "
+          f"{result['unverified']} turns of players that can't be seeded were not compared")
+
+    if replay_args.output:
+        with open(replay_args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if replay_args.verify and (result["mismatched"] or result["errors"]):
+        sys.exit(1)
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# results.py
+# Compact storage for the results of finished games.
+# A game keeps one RoundRecord per round rather than the Round and Turn objects that played it,
+# and finished games are streamed to an append-only json lines file so nothing accumulates in memory.
+
+import json                         # for the json lines results file
+
+
+class RoundRecord:
+    """
+    The outcome of one round: the throws and calls of each player in roster order and the throw total.
+    A call of None is a forfeited turn.
+    """
+    __slots__ = ("round_no", "throws", "calls", "total")
+
+    def __init__(self, round_no, throws, calls, total) -> None:
+        self.round_no = round_no
+        self.throws = throws
+        self.calls = calls
+        self.total = total
+        return None
+
+    def get_round_dict(self, game_id, player_names) -> dict:
+        turn_dicts = []
+        for i in range(0, len(player_names)):
+            turn_dicts.append({"player_id": player_names[i],
+                               "throw": self.throws[i],
+                               "call": self.calls[i]})
+        return {"game_id": str(game_id),
+                "round_no": self.round_no,
+                "turns": turn_dicts}
+
+
+class ResultsWriter:
+    """
+    Appends each finished game to a json lines file as one line:
+    {"game_id": ..., "players": [...], "winner": ..., "throws": [[...], ...], "calls": [[...], ...]}
+    throws and calls hold one row per round, in round order, with one column per player.
+    Lines are buffered and flushed every flush_every games and on close.
+    """
+    def __init__(self, path, flush_every=100) -> None:
+        self.path = path
+        self.flush_every = flush_every
+        self.games_written = 0
+        self._file = open(path, "a")
+        return None
+
+    def write_game(self, game) -> None:
+        line = {"game_id": str(game.game_id),
+                "players": game.get_player_names(),
+                "winner": game.get_winner(),
+                "throws": [r.throws for r in game.rounds],
+                "calls": [r.calls for r in game.rounds]}
+        self._file.write(json.dumps(line, separators=(",", ":")) + "\n")
+        self.games_written += 1
+        if self.games_written % self.flush_every == 0:
+            self._file.flush()
+        return None
+
+    def close(self) -> None:
+        self._file.close()
+        return None
+
+
+def read_games(path):
+    """Yields the games in a results file one at a time, as the dicts written by ResultsWriter"""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
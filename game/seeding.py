@@ -0,0 +1,22 @@
+# seeding.py
+# Derives every random choice of a seeded run from the run seed, so the same seed replays the same workload.
+# Game ids come from the seed and the game's index in the tournament, throws and calls from the seed,
+# game id, round number and player. Nothing depends on the order concurrent games happen to run in.
+# python_player derives its turns with turn_rng's key format, so a seeded python_player and a seeded
+# in-process python_player throw the same values.
+
+import hashlib                      # for stable ids from the seed
+import random                       # for the per turn random generators
+import uuid                         # for game ids in the usual format
+
+
+def game_id(seed, index) -> uuid.UUID:
+    return uuid.UUID(bytes=hashlib.sha256(f"{seed}:game:{index}".encode()).digest()[:16], version=4)
+
+
+def player_id(seed, game_id, player_name) -> str:
+    return hashlib.sha256(f"{seed}:{game_id}:{player_name}".encode()).hexdigest()[:8]
+
+
+def turn_rng(seed, game_id, round_no, player_name) -> random.Random:
+    return random.Random(f"{seed}:{game_id}:{round_no}:{player_name}")
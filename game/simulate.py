@@ -0,0 +1,65 @@
+# simulate.py
+# Vectorized batch simulator, plays many games at once with numpy instead of one turn request at a time.
+# Every active game plays its next round together: one array of throws and calls per player,
+# a row sum for the round totals and a comparison against the calls for the points.
+# Games leave the active set as soon as a player reaches the winning score.
+
+import numpy as np                  # for the vectorized rounds
+from strategies import BATCH_STRATEGIES
+
+
+WINNING_SCORE = 3
+
+
+def simulate(player_names, num_games, player_count, rng=None, chunk_size=1000000, strategy_names=None) -> dict:
+    """Plays num_games games between the named players
+
+    Games are simulated chunk_size at a time so memory stays flat however many games are played.
+
+    Args:
+        player_names (list): the players in roster order, each must have a strategy in BATCH_STRATEGIES unless strategy_names is given
+        num_games (int): how many games to play
+        player_count (int): the player count given to the strategies, as sent in the turn requests
+        rng (numpy.random.Generator): the random generator, a fresh unseeded one if not given
+        chunk_size (int): the most games simulated at once
+        strategy_names (list): the strategy in BATCH_STRATEGIES of each player, the player names if not given
+
+    Returns:
+        dict: wins per player name and the number of games that lasted each number of rounds
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    strategies = [BATCH_STRATEGIES[name] for name in (player_names if strategy_names is None else strategy_names)]
+    wins = np.zeros(len(player_names), dtype=np.int64)
+    rounds_per_game = np.zeros(1, dtype=np.int64)
+    for start in range(0, num_games, chunk_size):
+        winners, rounds = _simulate_chunk(strategies, min(chunk_size, num_games - start), player_count, rng)
+        wins += np.bincount(winners, minlength=len(player_names))
+        counts = np.bincount(rounds)
+        if counts.size > rounds_per_game.size:
+            counts[:rounds_per_game.size] += rounds_per_game
+            rounds_per_game = counts
+        else:
+            rounds_per_game[:counts.size] += counts
+    return {"wins": {name: int(wins[i]) for i, name in enumerate(player_names)},
+            "rounds_per_game": {n: int(c) for n, c in enumerate(rounds_per_game) if c}}
+
+
+def _simulate_chunk(strategies, num_games, player_count, rng) -> tuple:
+    scores = np.zeros((num_games, len(strategies)), dtype=np.int16)
+    rounds = np.zeros(num_games, dtype=np.int32)
+    winners = np.zeros(num_games, dtype=np.int64)
+    active = np.arange(num_games)
+    throws = np.empty((num_games, len(strategies)), dtype=np.int64)
+    calls = np.empty((num_games, len(strategies)), dtype=np.int64)
+    while active.size:
+        size = active.size
+        for i, strategy in enumerate(strategies):
+            throws[:size, i], calls[:size, i] = strategy(player_count, size, rng)
+        totals = throws[:size].sum(axis=1)
+        scores[active] += calls[:size] == totals[:, None]
+        rounds[active] += 1
+        won = scores[active] >= WINNING_SCORE
+        finished = won.any(axis=1)
+        winners[active[finished]] = won[finished].argmax(axis=1)  # first in roster order, as Game.play checks
+        active = active[~finished]
+    return winners, rounds
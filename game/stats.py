@@ -0,0 +1,141 @@
+# stats.py
+# Live tournament statistics, updated incrementally as rounds and games finish.
+# Every update is constant time per player: counters, running means and fixed histogram buckets,
+# nothing is kept per game. The aggregates are exported as prometheus metrics on /metrics.
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, start_http_server
+
+
+ROUNDS_BUCKETS = (3, 5, 10, 15, 20, 30, 40, 60, 80, 100, 150)
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class PlayerStats:
+    __slots__ = ("turns", "correct_calls", "forfeits", "wins", "games")
+
+    def __init__(self) -> None:
+        self.turns = 0
+        self.correct_calls = 0
+        self.forfeits = 0
+        self.wins = 0
+        self.games = 0
+        return None
+
+    def win_rate(self) -> float:
+        return self.wins / self.games if self.games else 0.0
+
+    def call_accuracy(self) -> float:
+        return self.correct_calls / self.turns if self.turns else 0.0
+
+
+class TournamentStats:
+    """
+    Game observer that keeps running statistics of a tournament.
+    Per player: turns, correct calls, forfeits, games and wins, from which the win rate and
+    call accuracy follow. Per tournament: games, rounds and the running mean of rounds per game.
+    The same figures are kept as prometheus metrics in registry, served on port by serve().
+    With export off only the plain figures are kept, for snapshot(), which is much cheaper per round.
+    """
+    def __init__(self, registry=None, export=True) -> None:
+        self.registry = CollectorRegistry() if registry is None else registry
+        self.export = export
+        self.players = {}
+        self.games = 0
+        self.rounds = 0
+        self.mean_rounds = 0.0
+        if not export:
+            return None
+
+        self._games = Counter('morra_games', 'Games finished', registry=self.registry)
+        self._rounds = Counter('morra_rounds', 'Rounds played', registry=self.registry)
+        self._turns = Counter('morra_turns', 'Turns taken', ['player'], registry=self.registry)
+        self._correct_calls = Counter('morra_correct_calls', 'Calls that matched the round total', ['player'], registry=self.registry)
+        self._forfeits = Counter('morra_forfeits', 'Turns forfeited by timeouts, errors or quarantine', ['player'], registry=self.registry)
+        self._wins = Counter('morra_wins', 'Games won', ['player'], registry=self.registry)
+        self._win_rate = Gauge('morra_win_rate', 'Fraction of their games each player has won', ['player'], registry=self.registry)
+        self._call_accuracy = Gauge('morra_call_accuracy', 'Fraction of their calls that matched the round total', ['player'], registry=self.registry)
+        self._mean_rounds = Gauge('morra_rounds_per_game_mean', 'Running mean of rounds per game', registry=self.registry)
+        self._rounds_per_game = Histogram('morra_rounds_per_game', 'Rounds each game lasted', buckets=ROUNDS_BUCKETS, registry=self.registry)
+        self._game_seconds = Histogram('morra_game_duration_seconds', 'Seconds each game took to play', registry=self.registry)
+        self._phase_seconds = Histogram('morra_round_phase_seconds', 'Seconds each round spent in each phase of play', ['phase'], buckets=LATENCY_BUCKETS, registry=self.registry)
+        self._turn_seconds = Histogram('morra_turn_seconds', 'Seconds each turn request took, forfeits included', ['player'], buckets=LATENCY_BUCKETS, registry=self.registry)
+        return None
+
+    def serve(self, port) -> None:
+        """Serves the metrics on http://0.0.0.0:port/metrics from a background thread"""
+        start_http_server(port, registry=self.registry)
+        return None
+
+    def track_spans(self, processor) -> None:
+        """Exports the spans waiting in and dropped by processor, a tracing.CountingBatchSpanProcessor"""
+        Gauge('morra_spans_queued', 'Spans waiting in the export queue', registry=self.registry).set_function(lambda: len(processor.queue))
+        Gauge('morra_spans_dropped', 'Sampled spans dropped because the export queue was full', registry=self.registry).set_function(lambda: processor.dropped)
+        return None
+
+    def _player(self, name) -> PlayerStats:
+        player = self.players.get(name)
+        if player is None:
+            player = self.players[name] = PlayerStats()
+            if self.export:
+                self._win_rate.labels(name).set_function(player.win_rate)  # rates are worked out when scraped, not on every turn
+                self._call_accuracy.labels(name).set_function(player.call_accuracy)
+        return player
+
+    def on_round(self, round) -> None:
+        self.rounds += 1
+        total = round.get_round_total()
+        for t in round.turns:
+            player = self._player(t.get_player().get_name())
+            player.turns += 1
+            if t.forfeit:
+                player.forfeits += 1
+            elif t.call == total:
+                player.correct_calls += 1
+        if self.export:
+            self._export_round(round, total)
+        return None
+
+    def _export_round(self, round, total) -> None:
+        self._rounds.inc()
+        for phase, seconds in round.phases.items():
+            self._phase_seconds.labels(phase).observe(seconds)
+        for t in round.turns:
+            name = t.get_player().get_name()
+            self._turns.labels(name).inc()
+            self._turn_seconds.labels(name).observe(t.latency)
+            if t.forfeit:
+                self._forfeits.labels(name).inc()
+            elif t.call == total:
+                self._correct_calls.labels(name).inc()
+        return None
+
+    def on_game(self, game) -> None:
+        self.games += 1
+        self.mean_rounds += (game.round_no - self.mean_rounds) / self.games  # running mean, no per game history
+        winner = game.get_winner()
+        for name in game.get_player_names():
+            player = self._player(name)
+            player.games += 1
+            if name == winner:
+                player.wins += 1
+        if self.export:
+            self._games.inc()
+            self._mean_rounds.set(self.mean_rounds)
+            self._rounds_per_game.observe(game.round_no)
+            self._game_seconds.observe(game.latency)
+            if winner is not None:
+                self._wins.labels(winner).inc()
+        return None
+
+    def snapshot(self) -> dict:
+        """The current figures as plain values"""
+        return {"games": self.games,
+                "rounds": self.rounds,
+                "mean_rounds": self.mean_rounds,
+                "players": {name: {"games": p.games,
+                                   "wins": p.wins,
+                                   "win_rate": p.win_rate(),
+                                   "turns": p.turns,
+                                   "call_accuracy": p.call_accuracy(),
+                                   "forfeits": p.forfeits}
+                            for name, p in self.players.items()}}
@@ -0,0 +1,184 @@
+# store.py
+# Embedded SQLite store for game history, and the queries that read it back.
+# Finished games are handed to a background thread that owns the database connection and writes them
+# in batches, one transaction per batch_games games, with bulk inserts into write-ahead logging mode.
+# The game loop only queues each game's compact results, it never waits on the disk.
+#
+# python main.py -n 100000 -c 16 --store results.db
+# python store.py results.db winrate
+# python store.py results.db rounds
+# python store.py results.db accuracy
+# python store.py results.db game 1b4e28ba-2fa1-11d2-883f-0016d3cca427
+
+import argparse                     # for parsing command line arguments
+import json                         # for the query results as json
+import logging                      # for logging
+import queue                        # for handing games to the writer thread
+import sqlite3                      # for the store
+import threading                    # for writing off the game loop
+import time                         # for when each game finished
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (game_id TEXT PRIMARY KEY, winner TEXT, rounds INTEGER, player_count INTEGER, seconds REAL, finished REAL);
+CREATE TABLE IF NOT EXISTS game_players (game_id TEXT, player TEXT, score INTEGER, won INTEGER, PRIMARY KEY (game_id, player));
+CREATE TABLE IF NOT EXISTS rounds (game_id TEXT, round_no INTEGER, total INTEGER, PRIMARY KEY (game_id, round_no));
+CREATE TABLE IF NOT EXISTS turns (game_id TEXT, round_no INTEGER, player TEXT, throw INTEGER, call INTEGER, correct INTEGER, PRIMARY KEY (game_id, round_no, player));
+CREATE INDEX IF NOT EXISTS games_rounds ON games (rounds);
+CREATE INDEX IF NOT EXISTS game_players_player ON game_players (player, won);
+CREATE INDEX IF NOT EXISTS rounds_round_no ON rounds (round_no);
+CREATE INDEX IF NOT EXISTS turns_player ON turns (player, correct);
+"""
+
+
+class ResultsStore:
+    """
+    Writes every finished game to the SQLite database at path: the game, each player's score,
+    each round's total and each turn's throw and call. Takes the place of a ResultsWriter.
+    write_game only queues the game. A writer thread inserts the queued games in one transaction
+    once batch_games have arrived or flush_interval seconds have passed, and close waits for it to
+    write everything queued. Games are keyed by game id, writing a game again replaces it.
+    """
+    def __init__(self, path, batch_games=500, flush_interval=1.0) -> None:
+        self.path = path
+        self.batch_games = batch_games
+        self.flush_interval = flush_interval
+        self.games_written = 0
+        self.games_failed = 0
+        self._queue = queue.SimpleQueue()
+        connection = sqlite3.connect(path)  # the schema is created up front so a bad path fails before the tournament starts
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        connection.close()
+        self._thread = threading.Thread(target=self._write, name="ResultsStore", daemon=True)
+        self._thread.start()
+        return None
+
+    def write_game(self, game) -> None:
+        self._queue.put((str(game.game_id),
+                         game.get_player_names(),
+                         [p.get_score() for p in game.players],
+                         game.get_winner(),
+                         game.rounds,
+                         game.latency,
+                         time.time()))
+        return None
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+        logger.info("Results store closed, " + str(self.games_written) + " games written to " + self.path)
+        return None
+
+    def _write(self) -> None:
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA synchronous=NORMAL")  # safe with WAL, a crash loses at most the last transactions
+        closing = False
+        while not closing:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_games:
+                try:
+                    game = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if game is None:
+                    closing = True
+                    break
+                batch.append(game)
+            if batch:
+                self._insert(connection, batch)
+        connection.close()
+        return None
+
+    def _insert(self, connection, batch) -> None:
+        games, game_players, rounds, turns = [], [], [], []
+        for game_id, names, scores, winner, records, seconds, finished in batch:
+            games.append((game_id, winner, len(records), len(names), seconds, finished))
+            game_players.extend((game_id, name, score, int(name == winner)) for name, score in zip(names, scores))
+            for r in records:
+                rounds.append((game_id, r.round_no, r.total))
+                turns.extend((game_id, r.round_no, name, throw, call, int(call == r.total))
+                             for name, throw, call in zip(names, r.throws, r.calls))
+        try:
+            with connection:  # one transaction for the whole batch
+                connection.executemany("INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?, ?, ?)", games)
+                connection.executemany("INSERT OR REPLACE INTO game_players VALUES (?, ?, ?, ?)", game_players)
+                connection.executemany("INSERT OR REPLACE INTO rounds VALUES (?, ?, ?)", rounds)
+                connection.executemany("INSERT OR REPLACE INTO turns VALUES (?, ?, ?, ?, ?, ?)", turns)
+            self.games_written += len(batch)
+        except sqlite3.Error as e:
+            self.games_failed += len(batch)
+            logger.error("Failed to write " + str(len(batch)) + " games to " + self.path + ": " + repr(e))
+        return None
+
+
+# QUERIES
+def connect(path) -> sqlite3.Connection:
+    """Opens the store read only, so queries can run while a tournament is writing to it"""
+    return sqlite3.connect("file:" + path + "?mode=ro", uri=True)
+
+
+def win_rates(connection) -> list:
+    """Games, wins and win rate per player, best first"""
+    rows = connection.execute("SELECT player, COUNT(*), SUM(won) FROM game_players GROUP BY player")
+    return sorted(({"player": player, "games": games, "wins": wins, "win_rate": wins / games} for player, games, wins in rows),
+                  key=lambda row: -row["win_rate"])
+
+
+def rounds_distribution(connection) -> dict:
+    """The number of games that lasted each number of rounds, with the mean and longest"""
+    counts = dict(connection.execute("SELECT rounds, COUNT(*) FROM games GROUP BY rounds ORDER BY rounds"))
+    played = sum(counts.values())
+    return {"games": played,
+            "mean": sum(rounds * n for rounds, n in counts.items()) / played if played else 0.0,
+            "longest": max(counts, default=0),
+            "counts": counts}
+
+
+def call_accuracy(connection) -> list:
+    """Turns, correct calls and forfeits per player, a forfeit is a turn without a call"""
+    rows = connection.execute("SELECT player, COUNT(*), SUM(correct), SUM(call IS NULL) FROM turns GROUP BY player")
+    return [{"player": player, "turns": turns, "correct_calls": correct, "forfeits": forfeits, "accuracy": correct / turns}
+            for player, turns, correct, forfeits in rows]
+
+
+def game_rounds(connection, game_id) -> list:
+    """Every turn of one game, in round order"""
+    rows = connection.execute("SELECT round_no, player, throw, call FROM turns WHERE game_id = ? ORDER BY round_no", (game_id,))
+    return [{"round_no": round_no, "player": player, "throw": throw, "call": call} for round_no, player, throw, call in rows]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query the game history in a results store.")
+    parser.add_argument('store', help='SQLite store written by main.py --store.')
+    parser.add_argument('query', choices=["winrate", "rounds", "accuracy", "game"], help='What to report.')
+    parser.add_argument('game_id', nargs='?', default=None, help='The game to show, for the game query.')
+    parser.add_argument('--json', action='store_true', help='Print the result as json.')
+    query_args = parser.parse_args()
+
+    connection = connect(query_args.store)
+    if query_args.query == "winrate":
+        result = win_rates(connection)
+        lines = [f"{r['player']:>14}: {r['wins']} of {r['games']} games ({100 * r['win_rate']:.1f}%)" for r in result]
+    elif query_args.query == "rounds":
+        result = rounds_distribution(connection)
+        lines = [f"{rounds:>4} rounds: {n} games" for rounds, n in result["counts"].items()]
+        lines.append(f"{result['games']} games, {result['mean']:.2f} rounds on average, the longest lasted {result['longest']}")
+    elif query_args.query == "accuracy":
+        result = call_accuracy(connection)
+        lines = [f"{r['player']:>14}: {r['correct_calls']} of {r['turns']} calls correct ({100 * r['accuracy']:.1f}%), {r['forfeits']} forfeits" for r in result]
+    else:
+        if query_args.game_id is None:
+            parser.error("the game query needs a game_id")
+        result = game_rounds(connection, query_args.game_id)
+        lines = [f"round {r['round_no']:>3} {r['player']:>14}: throw {r['throw']} call {r['call']}" for r in result]
+    connection.close()
+    print(json.dumps(result, indent=2) if query_args.json else "\n".join(lines))
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# strategies.py
+# The throw and call strategies of each player service, as pure functions, so games can be played in-process.
+# Each strategy has a scalar form, used by LocalPlayerClient to answer one turn request, and a vectorized form,
+# used by the batch simulator to answer the same turn for a whole array of games at once.
+# The strategies are stateless, so python_player here is the service as it played before it modelled its opponents,
+# it does not learn from the round records. Win rates from --local and --simulate are those of that earlier player.
+
+
+# SCALAR STRATEGIES
+# take the player count from the turn request and a random.Random, return (throw, call)
+def python_player(player_count, rng) -> tuple:
+    """
+    python_player as it played before its opponent model: throw 1-5, call is the throw plus one random 1-5 guess
+    multiplied by the other players. The service now calls the total its opponents most likely threw, given their
+    earlier throws in the game, and only falls back to this call until the game's first record arrives.
+    """
+    throw = rng.randint(1, 5)
+    return throw, throw + ((player_count - 1) * rng.randint(1, 5))
+
+def go_player(player_count, rng) -> tuple:
+    """go_player: throw 1-5, call is the throw plus a random 1-5 guess for each other player"""
+    throw = rng.randint(1, 5)
+    return throw, throw + sum(rng.randint(1, 5) for _ in range(0, player_count - 1))
+
+def node_player(player_count, rng) -> tuple:
+    """node_player: throw 1-4, call is the throw plus a random 1-4 guess for each other player"""
+    throw = rng.randint(1, 4)
+    return throw, throw + sum(rng.randint(1, 4) for _ in range(0, player_count - 1))
+
+
+# VECTORIZED STRATEGIES
+# take the player count, the number of games and a numpy.random.Generator, return (throws, calls) arrays
+def python_player_batch(player_count, size, rng) -> tuple:
+    """python_player before its opponent model, see python_player"""
+    throws = rng.integers(1, 6, size=size)
+    return throws, throws + (player_count - 1) * rng.integers(1, 6, size=size)
+
+def go_player_batch(player_count, size, rng) -> tuple:
+    throws = rng.integers(1, 6, size=size)
+    return throws, throws + rng.integers(1, 6, size=(size, player_count - 1)).sum(axis=1)
+
+def node_player_batch(player_count, size, rng) -> tuple:
+    throws = rng.integers(1, 5, size=size)
+    return throws, throws + rng.integers(1, 5, size=(size, player_count - 1)).sum(axis=1)
+
+
+STRATEGIES = {"python_player": python_player,
+              "go_player": go_player,
+              "node_player": node_player}
+
+BATCH_STRATEGIES = {"python_player": python_player_batch,
+                    "go_player": go_player_batch,
+                    "node_player": node_player_batch}
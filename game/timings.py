@@ -0,0 +1,81 @@
+# timings.py
+# Where round latency goes: the time each round spends in each of its phases and each player's turn requests.
+# Samples are counted into fixed log-spaced buckets, so recording is a bisect and an increment and memory
+# stays flat however long the tournament runs. Percentiles are read back from the buckets, to within
+# one bucket (about 6%).
+
+import bisect                       # for finding a sample's bucket
+
+
+# Bucket upper bounds in seconds, 40 per decade from 1 microsecond to 100 seconds
+BOUNDS = tuple(10 ** (-6 + i / 40) for i in range(0, 8 * 40 + 1))
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BOUNDS) + 1)  # the last bucket holds anything over the top bound
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        return None
+
+    def observe(self, seconds) -> None:
+        self.counts[bisect.bisect_left(BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        return None
+
+    def quantile(self, q) -> float:
+        """The upper bound of the bucket holding the q quantile, capped at the largest sample"""
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(BOUNDS[i] if i < len(BOUNDS) else self.max, self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class RoundTimings:
+    """
+    Game observer that times the phases of every round and every turn request, per player.
+    The phases are the ones Round.play records in round.phases: take_turns, judge and post_summary.
+    """
+    def __init__(self) -> None:
+        self.rounds = Histogram()
+        self.phases = {}
+        self.players = {}
+        return None
+
+    def on_round(self, round) -> None:
+        self.rounds.observe(round.latency)
+        for phase, seconds in round.phases.items():
+            histogram = self.phases.get(phase)
+            if histogram is None:
+                histogram = self.phases[phase] = Histogram()
+            histogram.observe(seconds)
+        for t in round.turns:
+            name = t.get_player().get_name()
+            histogram = self.players.get(name)
+            if histogram is None:
+                histogram = self.players[name] = Histogram()
+            histogram.observe(t.latency)
+        return None
+
+    def on_game(self, game) -> None:
+        return None
+
+    def summary(self) -> list:
+        """One row per timer: (name, count, mean, p50, p95, p99, max) in milliseconds, the whole round first, then the phases and the players"""
+        timers = [("round", self.rounds)]
+        timers += [("phase " + phase, h) for phase, h in self.phases.items()]
+        timers += [("turn " + name, h) for name, h in self.players.items()]
+        return [(name, h.count, h.mean() * 1000, h.quantile(0.5) * 1000, h.quantile(0.95) * 1000, h.quantile(0.99) * 1000, h.max * 1000)
+                for name, h in timers]
@@ -0,0 +1,51 @@
+# tracing.py
+# Keeps the cost of tracing a tournament bounded.
+# GameSampler makes the head sampling decision once per game: every trace started for a game carries its
+# game.id, and hashing the id decides for all of them, so a sampled game is traced in full and an
+# unsampled one costs no exported spans at all. CountingBatchSpanProcessor counts the spans the batch
+# processor drops when its queue is full, which it otherwise only warns about once.
+# Imported by main._setup_tracing only when tracing is on, the sdk is not loaded otherwise.
+
+import hashlib                      # for hashing game ids into the sample
+from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from opentelemetry.sdk.trace.sampling import Decision, Sampler, SamplingResult, TraceIdRatioBased
+
+
+class GameSampler(Sampler):
+    """
+    Samples ratio of the games, by game id.
+    A root span started with a game.id attribute is sampled if the hash of the game id falls in the ratio,
+    so every root span of a game gets the same decision. Root spans without a game id are sampled by
+    trace id at the same ratio. Use as the root of ParentBased so child spans follow their game.
+    """
+    def __init__(self, ratio) -> None:
+        self.ratio = ratio
+        self._bound = int(ratio * 2 ** 64)
+        self._by_trace_id = TraceIdRatioBased(ratio)
+        return None
+
+    def should_sample(self, parent_context, trace_id, name, kind=None, attributes=None, links=None, trace_state=None) -> SamplingResult:
+        game_id = attributes.get("game.id") if attributes else None
+        if game_id is None:
+            return self._by_trace_id.should_sample(parent_context, trace_id, name, kind, attributes, links, trace_state)
+        digest = hashlib.blake2b(str(game_id).encode(), digest_size=8).digest()
+        if int.from_bytes(digest, "big") < self._bound:
+            return SamplingResult(Decision.RECORD_AND_SAMPLE, attributes, trace_state)
+        return SamplingResult(Decision.DROP, None, trace_state)
+
+    def get_description(self) -> str:
+        return "GameSampler{" + str(self.ratio) + "}"
+
+
+class CountingBatchSpanProcessor(BatchSpanProcessor):
+    """BatchSpanProcessor that counts the sampled spans it drops because its export queue is full"""
+    def __init__(self, span_exporter, **kwargs) -> None:
+        super().__init__(span_exporter, **kwargs)
+        self.dropped = 0
+        return None
+
+    def on_end(self, span) -> None:
+        if not self.done and span.context.trace_flags.sampled and len(self.queue) >= self.max_queue_size:
+            self.dropped += 1  # the queue is a bounded deque, the oldest span is pushed out to make room
+        super().on_end(span)
+        return None
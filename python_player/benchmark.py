@@ -0,0 +1,114 @@
+# benchmark.py
+# Requests/sec and latency of the /turn handler, in its default mode and in low overhead mode.
+# Each mode is started as its own uvicorn server on a free local port and driven with concurrent turn requests.
+# Needs httpx, which is not part of the player image: pip install httpx
+#
+# python benchmark.py --requests 5000 --concurrency 32
+# python benchmark.py --modes low --sample-ratio 0.01 --output bench.json
+
+import argparse                     # for parsing command line arguments
+import asyncio                      # for driving concurrent requests
+import json                         # for the results file
+import os                           # for the server environment
+import socket                       # for finding a free port
+import statistics                   # for the latency percentiles
+import subprocess                   # for running the server under test
+import sys                          # for the python running the server
+import time                         # for timing requests
+import httpx                        # for the load generator
+
+
+MODES = {"default": {"MORRA_LOW_OVERHEAD": "0"},
+         "low": {"MORRA_LOW_OVERHEAD": "1"}}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, sample_ratio) -> tuple:
+    port = free_port()
+    env = dict(os.environ, MORRA_TRACE_SAMPLE_RATIO=str(sample_ratio), **MODES[mode])
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "python_player:app",
+                               "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              env=env,
+                              stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+    return server, "http://127.0.0.1:" + str(port)
+
+
+async def wait_ready(url, timeout=30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while True:
+            try:
+                if (await client.get("/ready")).status_code == 200:
+                    return None
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise
+            await asyncio.sleep(0.2)
+
+
+async def drive(url, num_requests, concurrency, warmup) -> dict:
+    """Sends num_requests turn requests, concurrency at a time, after warmup untimed ones"""
+    latencies = []
+    requests = iter(range(0, warmup + num_requests))
+
+    async def worker(client) -> None:
+        for i in requests:
+            body = {"reqgameid": "benchmark-" + str(i), "reqroundno": i, "reqplayercount": 3}
+            start = time.perf_counter()
+            response = await client.post("/turn", json=body)
+            response.raise_for_status()
+            response.json()
+            if i >= warmup:
+                latencies.append(time.perf_counter() - start)
+        return None
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(0, concurrency)))
+        elapsed = time.perf_counter() - start
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {"requests": len(latencies),
+            "requests_per_sec": len(latencies) / elapsed,  # warmup requests are included in elapsed, a slight underestimate
+            "p50_ms": cuts[49] * 1000,
+            "p95_ms": cuts[94] * 1000,
+            "p99_ms": cuts[98] * 1000}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the python_player /turn handler.")
+    parser.add_argument('-n', '--requests', type=int, default=2000, help='Timed requests per mode, default is 2000.')
+    parser.add_argument('-c', '--concurrency', type=int, default=16, help='Requests in flight at once, default is 16.')
+    parser.add_argument('--warmup', type=int, default=200, help='Untimed requests sent first, default is 200.')
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES), help='Modes to benchmark, default is all.')
+    parser.add_argument('--sample-ratio', type=float, default=1.0, help='MORRA_TRACE_SAMPLE_RATIO for the servers, default is 1.')
+    parser.add_argument('-o', '--output', default=None, help='File the results are written to as json.')
+    bench_args = parser.parse_args()
+
+    results = {"concurrency": bench_args.concurrency, "sample_ratio": bench_args.sample_ratio, "modes": {}}
+    for mode in bench_args.modes:
+        server, url = start_server(mode, bench_args.sample_ratio)
+        try:
+            asyncio.run(wait_ready(url))
+            result = asyncio.run(drive(url, bench_args.requests, bench_args.concurrency, bench_args.warmup))
+        finally:
+            server.terminate()
+            server.wait()
+        results["modes"][mode] = result
+        print(f"{mode:>8}: {result['requests_per_sec']:8.1f} req/sec  p50/p95/p99 {result['p50_ms']:.2f}/{result['p95_ms']:.2f}/{result['p99_ms']:.2f} ms")
+
+    if bench_args.output:
+        with open(bench_args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return None
+
+
+if __name__ == "__main__":
+    main()
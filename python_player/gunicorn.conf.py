@@ -0,0 +1,43 @@
+# gunicorn.conf.py
+# Production launch of python_player: several uvicorn worker processes behind one gunicorn master.
+# The turn handler is CPU bound, so one process per core lets a single container keep up with many game runners.
+#
+# gunicorn -c gunicorn.conf.py python_player:app
+#
+# Configuration is read from the environment:
+# MORRA_WORKERS=4                number of worker processes, default is one per core
+#                                each worker keeps its own opponent model and a game's records land on any worker,
+#                                so set MORRA_WORKERS=1 when the strategy's results matter, e.g. comparing win rates
+# MORRA_PORT=80                  port to listen on, default 80
+# MORRA_KEEPALIVE=75             seconds an idle keep-alive connection is held open, default 75 so pooled game connections are reused
+# MORRA_BACKLOG=2048             pending connections queued by the kernel before new ones are refused, default 2048
+# PROMETHEUS_MULTIPROC_DIR=...   where the workers write their metrics so /metrics can aggregate them, default /tmp/prometheus_multiproc
+
+import os                           # for the environment and the multiprocess metrics directory
+import shutil                       # for clearing stale metrics from an earlier run
+
+
+# The metrics directory must be in the environment before the workers import prometheus_client
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+
+bind = "0.0.0.0:" + os.environ.get("MORRA_PORT", "80")
+workers = int(os.environ.get("MORRA_WORKERS", os.cpu_count() or 1))
+worker_class = "uvicorn_worker.UvicornWorker"
+keepalive = int(os.environ.get("MORRA_KEEPALIVE", "75"))
+backlog = int(os.environ.get("MORRA_BACKLOG", "2048"))
+graceful_timeout = 10
+
+
+def on_starting(server) -> None:
+    """Clears metrics files left by an earlier run so counters don't carry over"""
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+    return None
+
+
+def child_exit(server, worker) -> None:
+    """Marks an exited worker's live gauges as dead, its counters and histograms are still aggregated"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+    return None
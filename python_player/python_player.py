@@ -1,14 +1,28 @@
-# This is the second simplest player, simply generates throws and calls and doesn't 
-# record the record of play to a database at this time but is manually instrumented for tracing
+# This is the second simplest player, it generates random throws and makes its calls from what it has seen
+# its opponents throw earlier in the game. It doesn't record the record of play to a database at this time
+# but is manually instrumented for tracing
 # Metrics are generated 
 # Logging is done using the logging library
 # Traceability is done using manual instrumentation and the FastAPIInstrumentor
+#
+# Configuration is read from the environment:
+# MORRA_LOW_OVERHEAD=1           skip the manual spans and per-request logging and answer turns from a pre-serialized template
+# MORRA_TRACE_SAMPLE_RATIO=0.01  fraction of traces sampled when the game did not already decide, default 1
+# MORRA_LOG_LEVEL=WARNING        log level, default DEBUG, or WARNING in low overhead mode
+# MORRA_HISTORY_GAMES=10000      most games whose opponent history is kept, least recently seen games are forgotten first
+#                                the history is per process, run gunicorn with MORRA_WORKERS=1 for strategy runs so a game's
+#                                records and turns reach the same model, see gunicorn.conf.py
+# MORRA_SEED=42                  derive each turn's throw and random call from the seed, game id and round number for reproducible runs
 
 # IMPORTS
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from pydantic import BaseModel
-from random import randint
+from random import Random
+from typing import List, Optional
+from collections import OrderedDict
+import json
 import logging
+import os
 from prometheus_client import Histogram
 from prometheus_fastapi_instrumentator import Instrumentator
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
@@ -16,6 +30,7 @@ from opentelemetry import trace
 from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.sdk.resources import SERVICE_NAME, Resource
 from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
 from opentelemetry.sdk.trace.export import (
     BatchSpanProcessor,
     ConsoleSpanExporter,
@@ -23,10 +38,15 @@ from opentelemetry.sdk.trace.export import (
 
 # CONSTANTS
 PLAYER_ID = "python_player"  # set player name/id here
+LOW_OVERHEAD = os.environ.get("MORRA_LOW_OVERHEAD", "0") == "1"
+TRACE_SAMPLE_RATIO = float(os.environ.get("MORRA_TRACE_SAMPLE_RATIO", "1.0"))
+LOG_LEVEL = os.environ.get("MORRA_LOG_LEVEL", "WARNING" if LOW_OVERHEAD else "DEBUG")
+HISTORY_GAMES = int(os.environ.get("MORRA_HISTORY_GAMES", "10000"))
+SEED = os.environ.get("MORRA_SEED")
 
 # TRACING SETUP
 resource = Resource(attributes={ SERVICE_NAME: PLAYER_ID })
-provider = TracerProvider(resource=resource)
+provider = TracerProvider(resource=resource, sampler=ParentBased(TraceIdRatioBased(TRACE_SAMPLE_RATIO)))  # follow the game's decision, sample our own roots by ratio
 processor = BatchSpanProcessor(OTLPSpanExporter(endpoint="agent:4317", insecure=True))
 provider.add_span_processor(processor)
 trace.set_tracer_provider(provider)
@@ -36,7 +56,7 @@ tracer = trace.get_tracer("player_turn.tracer")
 logging.basicConfig(
     format='%(asctime)s,%(msecs)03d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
     datefmt='%Y-%m-%d:%H:%M:%S',
-    level=logging.DEBUG)
+    level=LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
 # METRICS SETUP
@@ -54,13 +74,126 @@ class Turn_Response(BaseModel):
     resthrow: int
     rescall: int
 
+class Turns_Request(BaseModel):
+    turns: List[Turn_Request]
+
+class Turns_Response(BaseModel):
+    turns: List[Turn_Response]
+
+class Turn_Record(BaseModel):
+    player_id: str
+    throw: int
+    call: Optional[int]  # None when the player forfeited the turn
+
+class Round_Record(BaseModel):
+    game_id: str
+    round_no: int
+    turns: List[Turn_Record]
+
+class Records_Post(BaseModel):
+    records: List[Round_Record]
+
+class Records_Response(BaseModel):
+    received: int
+
+# OPPONENT MODEL
+class Game_History:
+    """How often each opponent has thrown each value in one game, and the most likely total of their throws"""
+    __slots__ = ("counts", "best_total")
+
+    def __init__(self) -> None:
+        self.counts = {}        # opponent -> [count of 1s, 2s, 3s, 4s, 5s]
+        self.best_total = None
+        return None
+
+    def add(self, opponent, throw) -> None:
+        counts = self.counts.get(opponent)
+        if counts is None:
+            counts = self.counts[opponent] = [0, 0, 0, 0, 0]
+        counts[throw - 1] += 1
+        return None
+
+    def update_best_total(self) -> None:
+        """The mode of the distribution of the opponents summed throws, each opponent's throws drawn from its table"""
+        distribution = {0: 1.0}
+        for counts in self.counts.values():
+            seen = sum(counts)
+            combined = {}
+            for total, p in distribution.items():
+                for value in range(0, 5):
+                    if counts[value]:
+                        combined[total + value + 1] = combined.get(total + value + 1, 0.0) + p * counts[value] / seen
+            distribution = combined
+        self.best_total = max(distribution, key=distribution.get) if self.counts else None
+        return None
+
+
+class Opponent_Model:
+    """
+    Frequency tables of each opponent's throws, per game, built from the round records the game posts.
+    The most likely total of the opponents' throws is worked out when a record arrives, so making a call
+    is a single lookup. At most max_games games are kept, the least recently seen is forgotten first.
+    """
+    def __init__(self, max_games) -> None:
+        self.max_games = max_games
+        self._games = OrderedDict()
+        return None
+
+    def record(self, round_record) -> None:
+        history = self._games.get(round_record.game_id)
+        if history is None:
+            history = self._games[round_record.game_id] = Game_History()
+            while len(self._games) > self.max_games:
+                self._games.popitem(last=False)
+        else:
+            self._games.move_to_end(round_record.game_id)
+        for turn in round_record.turns:
+            if turn.player_id != PLAYER_ID and turn.call is not None and 1 <= turn.throw <= 5:  # forfeited turns threw nothing
+                history.add(turn.player_id, turn.throw)
+        history.update_best_total()
+        return None
+
+    def best_total(self, game_id) -> Optional[int]:
+        history = self._games.get(game_id)
+        return None if history is None else history.best_total
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+
+opponent_model = Opponent_Model(HISTORY_GAMES)
+
+
 # HELPER FUNCTIONS
-def make_call(throw_value, player_count) -> int:
-    """Generates an integer (call) based on the throw value and player count
+unseeded_rng = Random()
+
+
+def _turn_rng(turn_request) -> Random:
+    """The generator for one turn, derived from MORRA_SEED, the game, the round and the player when seeded, so the game's seeded runs can be replayed"""
+    if SEED is None:
+        return unseeded_rng
+    return Random(f"{SEED}:{turn_request.reqgameid}:{turn_request.reqroundno}:{PLAYER_ID}")
+
+
+def _generate_throw(rng=unseeded_rng) -> int:
+    return rng.randint(1, 5)
+
+
+def _generate_call(throw_value, player_count, game_id=None, rng=unseeded_rng) -> int:
+    best_total = opponent_model.best_total(game_id)
+    if best_total is not None:
+        return throw_value + best_total  # the total the opponents have most likely thrown, given what they've thrown so far
+    return throw_value + ((player_count - 1) * rng.randint(1, 5))
+
+
+def make_call(throw_value, player_count, game_id=None, rng=unseeded_rng) -> int:
+    """Generates an integer (call) based on the throw value, player count and the opponents' throws earlier in the game
 
     Args:
         throw_value (_type_): the value of the players throw
         player_count (_type_): how many players are in the game
+        game_id (_type_): the game the call is for, its earlier rounds are used once their records have arrived
+        rng (_type_): the turn's random generator, see _turn_rng
 
     Returns:
         int: the players throw value, which is their guess at what the total of all throws will be
@@ -69,7 +202,7 @@ def make_call(throw_value, player_count) -> int:
     with tracer.start_as_current_span("make_call") as call_span:
         logger.debug("Generating call")
 
-        call = throw_value + ((player_count - 1) * randint(1, 5))
+        call = _generate_call(throw_value, player_count, game_id, rng)
         
         logger.debug("Call generated")
         call_span.set_attribute("player.id", PLAYER_ID)
@@ -77,7 +210,7 @@ def make_call(throw_value, player_count) -> int:
         return call
 
 
-def make_throw() -> int:
+def make_throw(rng=unseeded_rng) -> int:
     """Generates a random integer between 1 and 5
 
     This is the players throw. The throw is simply a random integer between 1 and 5 representing the number of fingers the player is holding out.
@@ -88,7 +221,7 @@ def make_throw() -> int:
     with tracer.start_as_current_span("make_throw") as throw_span:
         logger.debug("Generating throw")
 
-        throw = randint(1, 5)
+        throw = _generate_throw(rng)
 
         logger.debug("Throw generated")
         throw_span.set_attribute("player.id", PLAYER_ID)
@@ -125,13 +258,16 @@ async def create_turn(turn_request: Turn_Request) -> Turn_Response:
     Returns:
         Turn_Response: The response to the turn request, see DATA_MODELS above for structure of response
     """ 
+    if LOW_OVERHEAD:
+        return _fast_turn(turn_request)
 
     logger.debug("Turn request received")
+    rng = _turn_rng(turn_request)
     logger.debug("Trying throw")
-    throw_value = make_throw()
+    throw_value = make_throw(rng)
 
     logger.debug("Trying call")
-    call_value = make_call(throw_value, turn_request.reqplayercount)
+    call_value = make_call(throw_value, turn_request.reqplayercount, turn_request.reqgameid, rng)
 
     # tracing
     current_span = trace.get_current_span()
@@ -150,4 +286,89 @@ async def create_turn(turn_request: Turn_Request) -> Turn_Response:
                           resthrow=throw_value,
                           rescall=call_value)
 
+@app.post("/turns")  # the batch turn endpoint used to take many turns, from any number of games and rounds, in one request
+async def create_turns(turns_request: Turns_Request) -> Turns_Response:
+    """Respond to a batch of turn requests with a batch of turn responses
+
+    The game batches the turns it needs from this player across its concurrent games so the transport cost is paid once per batch.
+    Each turn is played exactly as it would be on /turn, the responses are in the same order as the requests.
+
+    Args:
+        turns_request (Turns_Request): the turn requests, see DATA_MODELS above for structure of request
+
+    Returns:
+        Turns_Response: the turn responses, see DATA_MODELS above for structure of response
+    """
+    if LOW_OVERHEAD:
+        return _fast_turns(turns_request)
+
+    logger.debug("Batch of " + str(len(turns_request.turns)) + " turn requests received")
+    with tracer.start_as_current_span("make_turns") as turns_span:
+        turns_span.set_attribute("player.id", PLAYER_ID)
+        turns_span.set_attribute("turns.count", len(turns_request.turns))
+        responses = []
+        for turn_request in turns_request.turns:
+            rng = _turn_rng(turn_request)
+            throw_value = _generate_throw(rng)
+            call_value = _generate_call(throw_value, turn_request.reqplayercount, turn_request.reqgameid, rng)
+            morra_throw_value.observe(throw_value)
+            responses.append(Turn_Response(resgameid=turn_request.reqgameid,
+                                           resroundno=turn_request.reqroundno,
+                                           resthrow=throw_value,
+                                           rescall=call_value))
+    return Turns_Response(turns=responses)
+
+@app.post("/records")  # the bulk record endpoint used to receive a batch of round records from the game
+async def create_records(records_post: Records_Post) -> Records_Response:
+    """Accept a batch of round records
+
+    The game batches the records of the rounds this player took part in and posts them here in the background.
+    Each record feeds the opponent model used to make calls, the records themselves are not kept.
+
+    Args:
+        records_post (Records_Post): the batch of round records, see DATA_MODELS above for structure of the post
+
+    Returns:
+        Records_Response: how many round records were received
+    """
+    logger.debug("Received " + str(len(records_post.records)) + " round records")
+    for round_record in records_post.records:
+        opponent_model.record(round_record)
+    return Records_Response(received=len(records_post.records))
+
+@app.post("/record")  # the record endpoint used to receive a single round record from the game
+async def create_record(round_record: Round_Record) -> Records_Response:
+    """Accept a single round record, see create_records"""
+    logger.debug("Received round record for game " + round_record.game_id + " round " + str(round_record.round_no))
+    opponent_model.record(round_record)
+    return Records_Response(received=1)
+
+# the turn response with its values left to fill in, so the low overhead path skips building and validating a Turn_Response
+TURN_RESPONSE_TEMPLATE = '{"resgameid":%s,"resroundno":%d,"resthrow":%d,"rescall":%d}'
+
+def _fast_turn(turn_request) -> Response:
+    """The low overhead turn: no manual spans, no per-request logging, a pre-serialized response"""
+    rng = _turn_rng(turn_request)
+    throw_value = _generate_throw(rng)
+    call_value = _generate_call(throw_value, turn_request.reqplayercount, turn_request.reqgameid, rng)
+    current_span = trace.get_current_span()
+    if current_span.is_recording():  # only pay for attributes on sampled requests
+        current_span.set_attribute("game.id", turn_request.reqgameid)
+        current_span.set_attribute("throw.value", throw_value)
+        current_span.set_attribute("call.value", call_value)
+    morra_throw_value.observe(throw_value)
+    content = TURN_RESPONSE_TEMPLATE % (json.dumps(turn_request.reqgameid), turn_request.reqroundno, throw_value, call_value)
+    return Response(content=content, media_type="application/json")
+
+def _fast_turns(turns_request) -> Response:
+    """The low overhead batch of turns, serialized straight from the template"""
+    parts = []
+    for turn_request in turns_request.turns:
+        rng = _turn_rng(turn_request)
+        throw_value = _generate_throw(rng)
+        call_value = _generate_call(throw_value, turn_request.reqplayercount, turn_request.reqgameid, rng)
+        morra_throw_value.observe(throw_value)
+        parts.append(TURN_RESPONSE_TEMPLATE % (json.dumps(turn_request.reqgameid), turn_request.reqroundno, throw_value, call_value))
+    return Response(content='{"turns":[' + ",".join(parts) + ']}', media_type="application/json")
+
 FastAPIInstrumentor.instrument_app(app)